@@ -1,9 +1,11 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, Literal
 
 class Settings(BaseSettings):
     openai_api_key: str
     mongodb_uri: str
+    mongodb_database: str = "Raina"
     openai_model: str = "gpt-4o"
 
     rabbitmq_host: str = "localhost"
@@ -11,9 +13,132 @@ class Settings(BaseSettings):
     rabbitmq_routing_key: str = "iba.artifacts.ready"
     rabbitmq_exchange_type: str = "topic"
     rabbitmq_routing_key_iba_stream: str = "iba.artifact.generated"
+    rabbitmq_publisher_confirms: bool = True
+    rabbitmq_confirm_batch_size: int = 50
+    rabbitmq_heartbeat: int = 60
+
+    # Background event emission (overflow: drop_oldest | block | spill)
+    iba_event_queue_size: int = 1000
+    iba_event_overflow: str = "drop_oldest"
+    iba_event_spill_path: str = "output/event_spill.jsonl"
+    iba_event_flush_timeout: float = 5.0
     VBA_API_URL: str = "http://localhost:8011"
     PLANTUML_SERVER_URL: str
 
+    # Local PlantUML rendering: warm `-pipe` workers per output format, results cached by code hash
+    plantuml_java_path: str = "java"
+    plantuml_jar_path: str = "tools/plantuml-1.2025.3.jar"
+    plantuml_workers: int = 2
+    plantuml_render_timeout: float = 20.0
+    plantuml_cache_size: int = 512
+    plantuml_warm_on_startup: bool = False
+
+    # Blueprint diagram images (remote | inline | file); local modes render up front
+    # and fall back to the PlantUML code block when a diagram fails or times out
+    iba_diagram_render: str = "remote"
+    iba_diagram_image_format: str = "svg"
+
+    # MongoDB connection pool (shared by every DAL module and step)
+    mongo_max_pool_size: int = 20
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int = 60000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_connect_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: int = 30000
+
+    # Index checks run at startup (also available as `python -m api.dal.indexes`)
+    mongo_ensure_indexes_on_startup: bool = False
+    mongo_verify_query_plans_on_startup: bool = False
+    mongo_fail_on_collscan: bool = False
+
+    # LLM fan-out
+    iba_llm_concurrency: int = 5
+    iba_adr_dedupe_threshold: float = 0.9
+
+    # Architecture guide digest embedded in ADR prompts: full | truncate | sections | summary
+    iba_adr_guide_strategy: Literal["full", "truncate", "sections", "summary"] = "sections"
+    iba_adr_guide_max_tokens: int = 1500
+
+    # Artifact tokens per LLM chunk, per model (falls back to iba_chunk_token_budget)
+    iba_chunk_token_budget: int = 3000
+    iba_chunk_token_budgets: Dict[str, int] = {
+        "gpt-4o": 8000,
+        "gpt-4": 3000,
+        "gpt-3.5-turbo": 3000,
+    }
+    # Content-defined chunk boundaries (stable across edits): a chunk at least min_fill
+    # full closes after a boundary document, which occur every ~boundary_gap × budget tokens.
+    # min_fill=1 packs greedily (fewest chunks, but one edit shifts every later chunk)
+    iba_chunk_min_fill: float = 0.4
+    iba_chunk_boundary_gap: float = 0.3
+
+    # How artifacts are rendered into prompts: json | yaml
+    iba_prompt_artifact_format: str = "json"
+
+    # LLM response cache (backend: none | memory | sqlite | mongo)
+    llm_cache_backend: str = "memory"
+    llm_cache_max_entries: int = 2048
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_sqlite_path: str = "output/llm_cache.sqlite3"
+    llm_cache_mongo_collection: str = "iba_llm_cache"
+
+    # LLM gateway: per-step model routing (steps not listed use openai_model), pooled
+    # connections, process-wide RPM/TPM budgets and retries with jittered backoff
+    iba_step_models: Dict[str, str] = {
+        "generate_adrs": "gpt-3.5-turbo",
+        "generate_tech_stack_guidance": "gpt-3.5-turbo",
+        "generate_system_diagram": "gpt-4",
+    }
+    llm_max_connections: int = 20
+    # Per attempt: budget waits and backoff between retries do not count against it
+    llm_request_timeout: float = 120.0
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200000
+    llm_completion_token_estimate: int = 800
+    llm_max_retries: int = 6
+    llm_backoff_base_seconds: float = 1.0
+    llm_backoff_max_seconds: float = 60.0
+
+    # USD per 1K tokens, used for the cost figures in traces and /metrics
+    llm_pricing_per_1k_tokens: Dict[str, Dict[str, float]] = {
+        "gpt-4o": {"prompt": 0.0025, "cached": 0.00125, "completion": 0.01},
+        "gpt-4": {"prompt": 0.03, "completion": 0.06},
+        "gpt-3.5-turbo": {"prompt": 0.0005, "completion": 0.0015},
+    }
+
+    # Incremental regeneration: reuse per-chunk outputs whose input fingerprint is unchanged
+    iba_incremental: bool = True
+    iba_chunk_output_collection: str = "iba_chunk_outputs"
+
+    # Graph nodes are async; unavoidable blocking work (files) runs on a bounded pool
+    iba_blocking_workers: int = 4
+
+    # Blueprint PDF export (sync | deferred | off), rendered by a WeasyPrint process pool
+    iba_pdf_mode: Literal["sync", "deferred", "off"] = "sync"
+    iba_pdf_workers: int = 2
+    iba_pdf_shutdown_timeout: float = 30.0
+
+    # Event-loop lag monitor: sample interval and the lag reported as a stall
+    iba_loop_lag_interval_seconds: float = 0.05
+    iba_loop_lag_threshold_seconds: float = 0.1
+    # Move start-up objects out of the collector's reach so full collections stay short
+    iba_gc_freeze_on_startup: bool = True
+
+    # Seconds between SSE keepalive comments on /iba/run/stream
+    iba_stream_keepalive_seconds: float = 15.0
+
+    # Async job mode (/iba/jobs); backend: local | rabbitmq
+    iba_job_backend: str = "local"
+    iba_job_workers: int = 4
+    iba_job_tenant_concurrency: int = 2
+    # rabbitmq: a job whose tenant is at its limit goes back to the broker after this delay
+    iba_job_requeue_delay_seconds: float = 1.0
+    # Running jobs hold a lease renewed every third of it; an expired lease lets another worker take over
+    iba_job_lease_seconds: float = 120.0
+    iba_job_queue: str = "iba.jobs"
+    iba_job_routing_key: str = "iba.job.submitted"
+    iba_job_collection: str = "iba_jobs"
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
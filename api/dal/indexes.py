@@ -0,0 +1,121 @@
+"""
+Index management for the artifact collections read by the IBA loader.
+
+    python -m api.dal.indexes --ensure --verify [--strict]
+
+--ensure creates any missing indexes, --verify runs explain() on the loader's
+queries and reports any that fall back to a collection scan; --strict exits
+non-zero when one does.
+"""
+from api.dal.mongo import get_db
+from api.dal.project_map_loader import PROJECTMAP_COLLECTIONS
+from pymongo.database import Database
+from typing import Dict, List, Optional, Tuple
+import argparse
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+PROBE_ID = "__iba_index_probe__"
+
+# collection → index key, derived from the loader's query shapes
+REQUIRED_INDEXES: Dict[str, List[Tuple[str, int]]] = {
+    "project_map": [("project_id", 1)],
+    "diagrams": [("project_id", 1), ("diagram_type", 1)],
+    **{collection: [(id_field, 1)] for collection, id_field in PROJECTMAP_COLLECTIONS.values()},
+}
+
+# collection → filter that mirrors what the loader sends
+REPRESENTATIVE_QUERIES: Dict[str, Dict] = {
+    "project_map": {"project_id": PROBE_ID},
+    "diagrams": {"project_id": PROBE_ID},
+    **{collection: {id_field: {"$in": [PROBE_ID]}} for collection, id_field in PROJECTMAP_COLLECTIONS.values()},
+}
+
+def _key_pattern(keys) -> Tuple:
+    # index_information() may report directions as floats (1.0)
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys)
+
+def ensure_indexes(db: Optional[Database] = None) -> List[str]:
+    """
+    Create the required indexes that are missing. An index with the same key pattern
+    under any other name counts as present: creating it again under our name would
+    fail with IndexOptionsConflict (code 85).
+    """
+    db = db if db is not None else get_db()
+    ensured = []
+    created = 0
+    for collection, keys in REQUIRED_INDEXES.items():
+        existing = {
+            _key_pattern(info["key"]): name for name, info in db[collection].index_information().items()
+        }
+        name = existing.get(_key_pattern(keys))
+        if name is None:
+            name = db[collection].create_index(keys, name="iba_" + "_".join(field for field, _ in keys))
+            created += 1
+        ensured.append(f"{collection}.{name}")
+    logger.info(f"[IBA] Ensured {len(ensured)} indexes ({created} created)")
+    return ensured
+
+def _plan_stages(plan) -> List[str]:
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _plan_stages(item)]
+    return []
+
+def verify_query_plans(db: Optional[Database] = None) -> List[Dict]:
+    """Explain every representative query and flag the ones that use a COLLSCAN."""
+    db = db if db is not None else get_db()
+    report = []
+    for collection, query in REPRESENTATIVE_QUERIES.items():
+        explain = db[collection].find(query).explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "collection": collection,
+            "filter": query,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+def check_indexes(ensure: bool = True, verify: bool = True, strict: bool = False, db: Optional[Database] = None) -> List[Dict]:
+    """Startup/CLI entry point: ensure indexes, verify plans, raise in strict mode on a scan."""
+    if ensure:
+        ensure_indexes(db)
+    if not verify:
+        return []
+
+    report = verify_query_plans(db)
+    scans = [r["collection"] for r in report if r["collscan"]]
+    if scans:
+        logger.warning(f"[IBA] Queries falling back to COLLSCAN on: {', '.join(scans)}")
+        if strict:
+            raise RuntimeError(f"Collection scan detected for: {', '.join(scans)}")
+    else:
+        logger.info(f"[IBA] All {len(report)} artifact queries use an index")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ensure", action="store_true", help="create missing indexes")
+    parser.add_argument("--verify", action="store_true", help="explain() representative queries")
+    parser.add_argument("--strict", action="store_true", help="exit 1 if any query uses a collection scan")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        report = check_indexes(ensure=args.ensure, verify=args.verify or not args.ensure, strict=args.strict)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    for row in report:
+        print(f"{'COLLSCAN' if row['collscan'] else 'ok':8} {row['collection']:28} {' > '.join(row['stages'])}")
+
+if __name__ == "__main__":
+    main()
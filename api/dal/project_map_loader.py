@@ -1,13 +1,12 @@
-from pymongo import MongoClient
-from api.config import get_settings
+from api.dal.mongo import get_async_db
+from api.utils.tracing import span
+import bson
 from typing import Dict, List, Tuple
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
-settings = get_settings()
-
-client = MongoClient(settings.mongodb_uri)
-db = client["Raina"]
 
 # project_map key → (collection, id field)
 PROJECTMAP_COLLECTIONS = {
@@ -33,22 +32,71 @@ PROJECTMAP_COLLECTIONS = {
     "transformation_rule_ids": ("transformation_rules", "rule_id"),
 }
 
-def load_project_artifacts(project_id: str) -> Tuple[str, Dict[str, List[Dict]], Dict]:
+# Prompts and summaries never read Mongo internals, so keep them off the wire
+ARTIFACT_PROJECTION = {"_id": 0}
+
+# Only the project_map fields the loader and steps read
+PROJECT_MAP_PROJECTION = {
+    "_id": 0,
+    "project_id": 1,
+    "paradigm": 1,
+    "selected_tech_stack": 1,
+    **{key: 1 for key in PROJECTMAP_COLLECTIONS},
+}
+
+# Documents BSON-encoded per collection to estimate its transfer size for metrics
+BYTES_SAMPLE_SIZE = 8
+
+def _estimate_bytes(docs: List[Dict]) -> int:
+    """Estimate the wire size of docs from an evenly spaced sample, keeping encoding off the hot path."""
+    if not docs:
+        return 0
+    step = max(1, len(docs) // BYTES_SAMPLE_SIZE)
+    sample = docs[::step][:BYTES_SAMPLE_SIZE]
+    return sum(len(bson.encode(doc)) for doc in sample) * len(docs) // len(sample)
+
+async def load_project_artifacts(project_id: str) -> Tuple[str, Dict[str, List[Dict]], Dict, Dict[str, float]]:
+    """
+    Load the project map and every referenced artifact collection.
+
+    The per-collection queries are sent concurrently over the shared async client.
+    Returns (paradigm, artifacts, project_map, timings), where timings maps
+    "project_map" and each queried collection to its round-trip time in ms.
+    """
     logger.info(f"[IBA] Loading artifacts for project: {project_id}")
 
-    project_map = db["project_map"].find_one({"project_id": project_id})
+    db = get_async_db()
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    with span("mongo", "project_map") as call_span:
+        project_map = await db["project_map"].find_one({"project_id": project_id}, PROJECT_MAP_PROJECTION)
+        if project_map:
+            call_span.add_bytes(len(bson.encode(project_map)))
+    timings["project_map"] = round((time.perf_counter() - started) * 1000, 2)
     if not project_map:
         raise ValueError(f"No project map found for project_id: {project_id}")
 
-    artifacts: Dict[str, List[Dict]] = {}
+    async def fetch(collection: str, id_field: str, ids: List) -> List[Dict]:
+        started = time.perf_counter()
+        with span("mongo", collection) as call_span:
+            results = await db[collection].find({id_field: {"$in": ids}}, ARTIFACT_PROJECTION).to_list(None)
+            call_span.add_bytes(_estimate_bytes(results))
+        timings[collection] = round((time.perf_counter() - started) * 1000, 2)
+        return results
+
+    # Keep PROJECTMAP_COLLECTIONS order in the result regardless of completion order
+    artifacts: Dict[str, List[Dict]] = {collection: [] for collection, _ in PROJECTMAP_COLLECTIONS.values()}
+    queries = [
+        (collection, fetch(collection, id_field, project_map[key]))
+        for key, (collection, id_field) in PROJECTMAP_COLLECTIONS.items()
+        if project_map.get(key)
+    ]
+    results = await asyncio.gather(*(query for _, query in queries))
+    for (collection, _), docs in zip(queries, results):
+        artifacts[collection] = docs
 
-    for key, (collection, id_field) in PROJECTMAP_COLLECTIONS.items():
-        ids = project_map.get(key, [])
-        if ids:
-            results = list(db[collection].find({id_field: {"$in": ids}}))
-            artifacts[collection] = results
-        else:
-            artifacts[collection] = []
+    logger.info(f"[IBA] Loaded {sum(len(v) for v in artifacts.values())} artifacts in {len(queries)} queries: {timings}")
 
     paradigm = project_map.get("paradigm", "application")
-    return paradigm, artifacts, project_map
+    return paradigm, artifacts, project_map, timings
@@ -0,0 +1,161 @@
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+import tiktoken
+from api.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Token-budget chunking: artifacts are packed into chunks of at most N prompt tokens
+# (per model) instead of a fixed item count. Documents that exceed the budget on their
+# own are split along their largest list field, or truncated as a last resort.
+#
+# Chunk boundaries are content-defined so they survive edits: once a chunk is at least
+# iba_chunk_min_fill full it is closed after the next "boundary" document, picked by its
+# content hash (on average one every iba_chunk_boundary_gap × budget tokens). Editing,
+# inserting or removing a document only moves boundaries up to the next boundary
+# document, so the other chunks keep their fingerprints and incremental runs reuse them.
+
+PART_KEY = "_part"
+TRUNCATED_KEY = "_truncated"
+
+@lru_cache()
+def _encoding(model: str):
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # BPE files are fetched on first use; without them fall back to an estimate
+        logger.warning(f"[IBA] tiktoken encoding unavailable for {model} ({e}); estimating tokens")
+        return None
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[: max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def serialize_document(doc: Dict) -> str:
+    return orjson.dumps(doc, default=str).decode()
+
+def document_tokens(doc: Dict, model: str) -> int:
+    return count_tokens(serialize_document(doc), model)
+
+def token_budget_for(model: str) -> int:
+    return settings.iba_chunk_token_budgets.get(model, settings.iba_chunk_token_budget)
+
+def _truncate_document(doc: Dict, budget: int, model: str) -> Dict:
+    """Wrap the document's JSON as a string cut so the whole wrapper fits `budget` tokens."""
+    text = serialize_document(doc)
+    target = budget - document_tokens({TRUNCATED_KEY: True, "content": ""}, model)
+    # Quotes and backslashes are escaped again inside the wrapper; shrink until it fits
+    for _ in range(5):
+        part = {TRUNCATED_KEY: True, "content": truncate_to_tokens(text, max(1, target), model)}
+        tokens = document_tokens(part, model)
+        if tokens <= budget or target <= 1:
+            return part
+        target = min(target - 1, int(target * budget / tokens))
+    return part
+
+def _list_parts(base: Dict, field: str, items: List, budget: int, model: str) -> List[List]:
+    # Items are measured with their "," separator; a group that still measures over
+    # budget (tokens do not add up exactly) is halved rather than truncated
+    base_tokens = document_tokens({**base, field: [], PART_KEY: "00/00"}, model)
+    groups: List[List] = []
+    current: List = []
+    current_tokens = base_tokens
+    for item in items:
+        item_tokens = count_tokens(serialize_document(item) + ",", model)
+        if current and current_tokens + item_tokens > budget:
+            groups.append(current)
+            current, current_tokens = [], base_tokens
+        current.append(item)
+        current_tokens += item_tokens
+    groups.append(current)
+
+    fitted: List[List] = []
+    while groups:
+        group = groups.pop(0)
+        if len(group) > 1 and document_tokens({**base, field: group, PART_KEY: "00/00"}, model) > budget:
+            half = len(group) // 2
+            groups[:0] = [group[:half], group[half:]]
+        else:
+            fitted.append(group)
+    return fitted
+
+def split_document(doc: Dict, budget: int, model: str) -> List[Dict]:
+    """Split an oversized document into parts that each fit `budget` tokens."""
+    if document_tokens(doc, model) <= budget:
+        return [doc]
+
+    list_fields = [k for k, v in doc.items() if isinstance(v, list) and len(v) > 1]
+    if not list_fields:
+        return [_truncate_document(doc, budget, model)]
+
+    # Spread the biggest list over several parts, each carrying the document's other fields
+    field = max(list_fields, key=lambda k: len(serialize_document({k: doc[k]})))
+    base = {k: v for k, v in doc.items() if k != field}
+    groups = _list_parts(base, field, doc[field], budget, model)
+
+    parts = []
+    for i, items in enumerate(groups, 1):
+        part = {**base, field: items, PART_KEY: f"{i}/{len(groups)}"}
+        # Only a single item too big for a part on its own (or oversized other fields) is cut
+        if document_tokens(part, model) > budget:
+            part = _truncate_document(part, budget, model)
+        parts.append(part)
+    return parts
+
+def _is_boundary(serialized: str, tokens: int, budget: int) -> bool:
+    # Odds proportional to the document's size: boundaries fall every ~boundary_gap × budget tokens
+    digest = hashlib.sha256(serialized.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64 < tokens / (budget * settings.iba_chunk_boundary_gap)
+
+def pack_by_token_budget(items: List[Tuple[str, Dict]], model: str, budget: Optional[int] = None) -> List[List[Tuple[str, Dict]]]:
+    """Pack (artifact_type, document) pairs into chunks of at most `budget` tokens, cut at content-defined boundaries."""
+    budget = budget or token_budget_for(model)
+    min_fill = budget * settings.iba_chunk_min_fill
+    chunks: List[List[Tuple[str, Dict]]] = []
+    current: List[Tuple[str, Dict]] = []
+    current_tokens = 0
+
+    for artifact_type, doc in items:
+        for part in split_document(doc, budget, model):
+            serialized = serialize_document(part)
+            tokens = count_tokens(serialized, model)
+            if current and current_tokens + tokens > budget:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append((artifact_type, part))
+            current_tokens += tokens
+            if current_tokens >= min_fill and _is_boundary(serialized, tokens, budget):
+                chunks.append(current)
+                current, current_tokens = [], 0
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+def estimate_chunk_plan(chunks: List[List[Dict]], model: str) -> Dict:
+    """Expected LLM calls and artifact input tokens for a list of chunks (documents only)."""
+    docs = [doc for chunk in chunks for doc in chunk]
+    return {
+        "model": model,
+        "token_budget": token_budget_for(model),
+        "calls": len(chunks),
+        "artifact_tokens": sum(document_tokens(doc, model) for doc in docs),
+        "split_parts": sum(1 for doc in docs if PART_KEY in doc),
+        "truncated": sum(1 for doc in docs if doc.get(TRUNCATED_KEY)),
+    }
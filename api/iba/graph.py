@@ -1,3 +1,5 @@
+from functools import lru_cache
+import inspect
 from langgraph.graph import StateGraph
 from api.iba.state import IBAState
 from api.iba.steps.load_artifacts import load_artifacts
@@ -8,33 +10,89 @@ from api.iba.steps.generate_tech_stack import generate_tech_stack_guidance
 from api.iba.steps.generate_system_diagram import generate_system_diagram  # 🆕 Add this
 from api.iba.steps.render_output import render_final_output
 from api.iba.steps.summarize_artifacts import summarize_artifacts
+from api.utils.llm_usage import merge_node_usage
+from api.utils.stream import stream_node_completed
+from api.utils.tracing import traced_node
+
+# Branches that only need the loaded artifacts / tech stack, not the architecture guide.
+# They run alongside the guide chain and must return partial updates for their own fields.
+INDEPENDENT_BRANCHES = [
+    "generate_diagrams",
+    "generate_tech_stack_guidance",
+    "generate_system_diagram",
+]
+
+# Summaries → guide → ADRs run in order inside one node. LangGraph only starts the next
+# superstep once every node of the current one is done, so as separate nodes the guide
+# would wait for the slowest independent branch; as one node the chain shares their
+# superstep and the run takes max(chain, branches).
+GUIDE_CHAIN = [
+    ("summarize_artifacts", summarize_artifacts),
+    ("generate_guide", generate_architecture_guide),
+    ("generate_adrs", generate_adrs),
+]
+GUIDE_CHAIN_FIELDS = (
+    "entity_summary", "flow_summary", "story_summary",
+    "architecture_guide", "guide_overview", "guide_sections", "adrs",
+)
+MERGED_FIELDS = ("llm_usage", "trace")
+
+def _async_node(name: str, fn):
+    # Sync nodes would run on LangGraph's unbounded default executor (or block the loop);
+    # blocking work belongs in api.utils.executor.run_blocking inside an async node.
+    if not inspect.iscoroutinefunction(fn):
+        raise TypeError(f"IBA graph node '{name}' must be async")
+    return traced_node(name, fn)
+
+def _step_update(result) -> dict:
+    if isinstance(result, IBAState):
+        return {field: getattr(result, field) for field in (*GUIDE_CHAIN_FIELDS, *MERGED_FIELDS)}
+    return result or {}
+
+async def run_guide_chain(state: IBAState) -> dict:
+    """Run the guide chain; returns only the fields it owns (each step keeps its own trace)."""
+    state = state.model_copy()
+    update = {field: {} for field in MERGED_FIELDS}
+    for name, step in GUIDE_CHAIN:
+        step_update = _step_update(await _async_node(name, step)(state))
+        for field, value in step_update.items():
+            if field in MERGED_FIELDS:
+                update[field] = merge_node_usage(update[field], value)
+                value = merge_node_usage(getattr(state, field), value)
+            else:
+                update[field] = value
+            setattr(state, field, value)
+        stream_node_completed(name, step_update)
+    return update
 
 def build_iba_graph() -> StateGraph:
     builder = StateGraph(IBAState)
 
-    # Register all steps
-    builder.add_node("load_artifacts", load_artifacts)
-    builder.add_node("generate_guide", generate_architecture_guide)
-    builder.add_node("generate_diagrams", embed_system_diagrams)
-    builder.add_node("generate_adrs", generate_adrs)
-    builder.add_node("generate_tech_stack_guidance", generate_tech_stack_guidance)
-    builder.add_node("generate_system_diagram", generate_system_diagram)  # 🆕 Add node
-    builder.add_node("render_output", render_final_output)
-    builder.add_node("summarize_artifacts", summarize_artifacts)
+    # Register all steps (all async; each traced so its timings, calls and tokens land in state.trace;
+    # the guide chain traces its steps individually)
+    builder.add_node("load_artifacts", _async_node("load_artifacts", load_artifacts))
+    builder.add_node("guide_chain", run_guide_chain)
+    builder.add_node("generate_diagrams", _async_node("generate_diagrams", embed_system_diagrams))
+    builder.add_node("generate_tech_stack_guidance", _async_node("generate_tech_stack_guidance", generate_tech_stack_guidance))
+    builder.add_node("generate_system_diagram", _async_node("generate_system_diagram", generate_system_diagram))  # 🆕 Add node
+    builder.add_node("render_output", _async_node("render_output", render_final_output))
 
     # Entry
     builder.set_entry_point("load_artifacts")
 
-    # Transitions
-    builder.add_edge("load_artifacts", "summarize_artifacts")
-    builder.add_edge("summarize_artifacts", "generate_guide")
-    builder.add_edge("generate_guide", "generate_diagrams")
-    builder.add_edge("generate_diagrams", "generate_adrs")
-    builder.add_edge("generate_adrs", "generate_tech_stack_guidance")
-    builder.add_edge("generate_tech_stack_guidance", "generate_system_diagram")  # 🆕 New edge
-    builder.add_edge("generate_system_diagram", "render_output")  # 🆕 New edge
+    # Fan out the guide chain and the independent branches right after loading
+    for node in ["guide_chain", *INDEPENDENT_BRANCHES]:
+        builder.add_edge("load_artifacts", node)
+
+    # Fan in: render only once every branch has finished
+    builder.add_edge(["guide_chain", *INDEPENDENT_BRANCHES], "render_output")
 
     # Exit
     builder.set_finish_point("render_output")
 
     return builder.compile()
+
+@lru_cache()
+def get_iba_graph():
+    """Compiled IBA graph shared by all requests (built once, at startup)."""
+    return build_iba_graph()
@@ -0,0 +1,104 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+from langchain.prompts import ChatPromptTemplate
+from api.config import get_settings
+from api.iba.chunking import count_tokens, truncate_to_tokens
+from api.iba.state import IBAState
+from api.utils.executor import run_blocking
+from api.utils.llm_cache import cached_ainvoke
+from api.utils.llm_usage import LLMUsage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# The architecture guide is embedded in every ADR chunk prompt. A digest is built once
+# per run and reused by every chunk, bounded to iba_adr_guide_max_tokens:
+#   full      - the whole guide (previous behaviour)
+#   truncate  - the synthesized overview, cut to the token bound
+#   sections  - half the bound for the overview, the rest split evenly between the
+#               detailed insights per artifact type; a chunk gets the overview plus the
+#               sections of the artifact types it contains
+#   summary   - one LLM call compresses the guide; falls back to truncate on failure
+
+STRATEGIES = ("full", "truncate", "sections", "summary")
+
+GUIDE_DIGEST_PROMPT = ChatPromptTemplate.from_template("""
+You are a senior software architect.
+
+Compress the architecture guide below into a digest of at most {max_words} words that keeps every
+architectural decision, component, technology choice, constraint and data/integration flow.
+Drop examples, repetition and general advice. Respond in Markdown.
+
+---
+
+{architecture_guide}
+""")
+
+class GuideDigest:
+    """
+    The guide text every ADR chunk gets. Everything is tokenized and truncated here, once
+    per run (build it off the loop); for_chunk only joins precomputed strings.
+    """
+
+    def __init__(self, strategy: str, text: str, sections: Dict[str, str], max_tokens: int, model: str):
+        self.strategy = strategy
+        self.text = text
+        self.max_tokens = max_tokens
+        self.model = model
+        self.text_tokens = count_tokens(text, model)
+
+        self.sections: Dict[str, str] = {}
+        present = {artifact_type: section for artifact_type, section in sections.items() if section}
+        if strategy == "sections" and present:
+            per_section = (max_tokens - self.text_tokens) // len(present)
+            for artifact_type, section in present.items():
+                # The heading and the separator count towards the section's share
+                heading = f"### {artifact_type}\n"
+                budget = max(1, per_section - count_tokens("\n\n" + heading, model))
+                self.sections[artifact_type] = heading + truncate_to_tokens(section, budget, model)
+
+    def for_chunk(self, artifact_types: Iterable[str]) -> str:
+        parts = [self.sections[t] for t in artifact_types if t in self.sections]
+        return "\n\n".join([self.text, *parts]) if parts else self.text
+
+    def tokens(self) -> int:
+        return self.text_tokens
+
+def _make_digest(strategy: str, text: str, text_budget: Optional[int], sections: Dict[str, str],
+                 max_tokens: int, model: str) -> GuideDigest:
+    if text_budget is not None:
+        text = truncate_to_tokens(text, text_budget, model)
+    return GuideDigest(strategy, text, sections, max_tokens, model)
+
+async def build_guide_digest(state: IBAState, llm, strategy: Optional[str] = None,
+                             usage: Optional[LLMUsage] = None) -> GuideDigest:
+    strategy = strategy or settings.iba_adr_guide_strategy
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown ADR guide strategy: {strategy}")
+
+    model = llm.model_name
+    max_tokens = settings.iba_adr_guide_max_tokens
+    guide = state.architecture_guide or "N/A"
+    overview = state.guide_overview or guide
+    sections = state.guide_sections or {}
+
+    if strategy == "full":
+        return await run_blocking(_make_digest, strategy, guide, None, sections, max_tokens, model)
+
+    if strategy == "summary":
+        try:
+            messages = GUIDE_DIGEST_PROMPT.format_messages(
+                max_words=int(max_tokens * 0.75),
+                architecture_guide=guide,
+            )
+            summary = (await cached_ainvoke(llm, messages, usage)).content.strip()
+            return await run_blocking(_make_digest, strategy, summary, max_tokens, sections, max_tokens, model)
+        except Exception as e:
+            logger.warning(f"[IBA] Guide summary failed, truncating instead: {e}")
+            strategy = "truncate"
+
+    if strategy == "sections":
+        return await run_blocking(_make_digest, strategy, overview, max_tokens // 2, sections, max_tokens, model)
+
+    return await run_blocking(_make_digest, strategy, overview, max_tokens, sections, max_tokens, model)
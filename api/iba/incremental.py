@@ -0,0 +1,71 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+import orjson
+from api.config import get_settings
+from api.dal.mongo import get_async_db
+from api.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Incremental regeneration: every artifact document gets a content fingerprint, every
+# chunk a fingerprint built from its documents' fingerprints plus the prompt inputs that
+# shape its output. Per-chunk outputs of the last run are stored per (project, node), so
+# the next run only calls the LLM for chunks whose fingerprint is new.
+
+def fingerprint(value: Any) -> str:
+    return hashlib.sha256(orjson.dumps(value, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+def fingerprint_documents(documents: Iterable[Dict]) -> List[str]:
+    return [fingerprint(doc) for doc in documents]
+
+def template_fingerprint(template) -> str:
+    """Fingerprint of a ChatPromptTemplate's text, so stored outputs expire when the prompt is edited."""
+    messages = [
+        (type(message).__name__, getattr(getattr(message, "prompt", None), "template", str(message)))
+        for message in template.messages
+    ]
+    return fingerprint({"messages": messages, "partial": template.partial_variables})
+
+def chunk_fingerprint(node: str, model: str, documents: Iterable[Dict], *context: Any) -> str:
+    return fingerprint({
+        "node": node,
+        "model": model,
+        "context": list(context),
+        "documents": fingerprint_documents(documents),
+    })
+
+async def load_chunk_outputs(project_id: str, node: str) -> Dict[str, Any]:
+    """Per-chunk outputs persisted by the previous run, keyed by chunk fingerprint."""
+    if not settings.iba_incremental:
+        return {}
+    try:
+        with span("mongo", settings.iba_chunk_output_collection):
+            doc = await get_async_db()[settings.iba_chunk_output_collection].find_one({"_id": f"{project_id}:{node}"})
+    except Exception as e:
+        logger.warning(f"[IBA] Could not load previous chunk outputs for {project_id}/{node}: {e}")
+        return {}
+    return (doc or {}).get("outputs", {})
+
+async def save_chunk_outputs(project_id: str, node: str, outputs: Dict[str, Any]):
+    """Replace the stored outputs with this run's, so stale chunks do not accumulate."""
+    if not settings.iba_incremental:
+        return
+    try:
+        with span("mongo", settings.iba_chunk_output_collection):
+            await get_async_db()[settings.iba_chunk_output_collection].replace_one(
+                {"_id": f"{project_id}:{node}"},
+                {
+                    "_id": f"{project_id}:{node}",
+                    "project_id": project_id,
+                    "node": node,
+                    "outputs": outputs,
+                    "updated_at": datetime.utcnow(),
+                },
+                upsert=True,
+            )
+    except Exception as e:
+        logger.warning(f"[IBA] Could not persist chunk outputs for {project_id}/{node}: {e}")
@@ -0,0 +1,49 @@
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from langchain.chat_models import ChatOpenAI
+from api.config import get_settings
+from api.utils.llm_gateway import get_openai_clients
+
+# Single place where IBA steps get their chat model. Each step is routed to its
+# configured model (`iba_step_models`, falling back to `openai_model`), and one
+# instance per (model, temperature) is shared by every run; all of them talk through
+# the gateway's pooled OpenAI clients. The factory can be swapped (the offline
+# benchmarks install a fake model) without patching every step module.
+
+_factory: Optional[Callable] = None
+_models: Dict[Tuple[str, float], object] = {}
+_models_lock = threading.Lock()
+
+def _openai_chat_model(**kwargs):
+    sync_client, async_client = get_openai_clients()
+    return ChatOpenAI(
+        client=sync_client.chat.completions,
+        async_client=async_client.chat.completions,
+        openai_api_key=get_settings().openai_api_key,
+        max_retries=0,
+        **kwargs,
+    )
+
+def set_chat_model_factory(factory: Optional[Callable]):
+    """Build every step's chat model with `factory(**kwargs)`; None restores ChatOpenAI."""
+    global _factory
+    with _models_lock:
+        _factory = factory
+        _models.clear()
+
+def create_chat_model(**kwargs):
+    if _factory is not None:
+        return _factory(**kwargs)
+    return _openai_chat_model(**kwargs)
+
+def model_for_step(step: str) -> str:
+    settings = get_settings()
+    return settings.iba_step_models.get(step) or settings.openai_model
+
+def chat_model_for(step: str, temperature: float = 0.0):
+    """Shared chat model for a graph step."""
+    key = (model_for_step(step), temperature)
+    with _models_lock:
+        if key not in _models:
+            _models[key] = create_chat_model(model=key[0], temperature=temperature)
+        return _models[key]
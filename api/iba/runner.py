@@ -0,0 +1,31 @@
+from api.iba.graph import get_iba_graph
+from api.iba.state import IBAState
+import logging
+
+logger = logging.getLogger(__name__)
+
+def build_run_response(final_state: IBAState) -> dict:
+    return {
+        "project_id": final_state.project_id,
+        "paradigm": final_state.paradigm,
+        "blueprint_markdown": final_state.blueprint_markdown,
+        "diagrams": final_state.diagrams,
+        "adrs": final_state.adrs,
+        "file_info": final_state.exported_files,
+        "llm_usage": final_state.llm_usage,
+        "trace": final_state.trace,
+    }
+
+async def run_blueprint(project_id: str) -> dict:
+    """Run the shared IBA graph for one project and return the API response payload."""
+    # Shared graph, compiled once at startup
+    graph = get_iba_graph()
+
+    # Initial LangGraph state
+    initial_state = IBAState(project_id=project_id)
+
+    logger.info(f"[IBA] Running implementation blueprint agent for project {project_id}")
+
+    # Run the graph and rehydrate final state into IBAState
+    result = await graph.ainvoke(initial_state)
+    return build_run_response(IBAState(**result))
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List
+
+import orjson
+import yaml
+from api.config import get_settings
+from api.dal.project_map_loader import PROJECTMAP_COLLECTIONS
+from api.iba.chunking import count_tokens
+
+settings = get_settings()
+
+# Compact, canonical artifact serialization for prompts: Mongo/bookkeeping fields are
+# dropped, empty values removed, the identifying fields lead and the rest follow in
+# sorted order, so prompts are smaller and byte-stable across runs.
+
+INTERNAL_FIELDS = {
+    "_id", "__v", "project_id",
+    "created_at", "updated_at", "createdAt", "updatedAt",
+    "embedding", "embeddings",
+}
+
+# Fields that lead every document, after the collection's id field
+LEADING_FIELDS = ["name", "title", "flow_name", "summary", "description"]
+
+ID_FIELDS: Dict[str, str] = {collection: id_field for collection, id_field in PROJECTMAP_COLLECTIONS.values()}
+
+# Documents per artifact type tokenized to estimate the serialization savings
+SAVINGS_SAMPLE_DOCS = 20
+
+class _PromptDumper(yaml.SafeDumper):
+    """SafeDumper that writes values it has no representer for (ObjectId, Decimal128...) as strings."""
+
+def _represent_fallback(dumper: yaml.SafeDumper, value: Any):
+    if isinstance(value, dict):
+        return dumper.represent_dict(value)
+    if isinstance(value, (list, tuple)):
+        return dumper.represent_list(value)
+    return dumper.represent_str(str(value))
+
+_PromptDumper.add_multi_representer(object, _represent_fallback)
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+def _compact_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _compact_value(value[k]) for k in sorted(value) if k not in INTERNAL_FIELDS and not _is_empty(value[k])}
+    if isinstance(value, list):
+        return [_compact_value(v) for v in value if not _is_empty(v)]
+    return value
+
+def compact_document(artifact_type: str, doc: Dict) -> Dict:
+    leading = [ID_FIELDS[artifact_type]] if artifact_type in ID_FIELDS else []
+    leading += [f for f in LEADING_FIELDS if f not in leading]
+
+    ordered = [k for k in leading if k in doc] + sorted(k for k in doc if k not in leading)
+    return {
+        k: _compact_value(doc[k])
+        for k in ordered
+        if k not in INTERNAL_FIELDS and not _is_empty(doc[k])
+    }
+
+def compact_artifacts(artifacts: Dict[str, List[Dict]]) -> Dict[str, List[Dict]]:
+    return {artifact_type: [compact_document(artifact_type, doc) for doc in docs] for artifact_type, docs in artifacts.items()}
+
+def _dump(value: Any) -> str:
+    if settings.iba_prompt_artifact_format == "yaml":
+        return yaml.dump(
+            value, Dumper=_PromptDumper, sort_keys=False, allow_unicode=True, default_flow_style=False, width=1000
+        )
+    return orjson.dumps(value, default=str).decode()
+
+def serialize_artifacts(docs: List[Dict]) -> str:
+    """Prompt text for a list of already-compacted documents of one artifact type."""
+    return _dump(docs)
+
+def serialize_artifact_groups(groups: Dict[str, List[Dict]]) -> str:
+    """Prompt text for already-compacted documents grouped by artifact type."""
+    return _dump(groups)
+
+def measure_savings(raw: Dict[str, List[Dict]], compact: Dict[str, List[Dict]], model: str,
+                    sample_docs: int = SAVINGS_SAMPLE_DOCS) -> Dict:
+    """
+    Tokens the compact form saves over the Python repr the prompts used to receive.
+    Estimated from an evenly spaced sample of each type's documents, scaled to the
+    type's document count, so it costs the same for 10 artifacts or 10,000.
+    """
+    raw_tokens = compact_tokens = 0.0
+    sampled = 0
+    for artifact_type, docs in raw.items():
+        compact_docs = compact.get(artifact_type, [])
+        if not docs or len(compact_docs) != len(docs):
+            continue
+        sample = range(0, len(docs), max(1, len(docs) // sample_docs))[:sample_docs]
+        scale = len(docs) / len(sample)
+        raw_tokens += scale * count_tokens(str([docs[i] for i in sample]), model)
+        compact_tokens += scale * count_tokens(_dump([compact_docs[i] for i in sample]), model)
+        sampled += len(sample)
+    return {
+        "raw_tokens": round(raw_tokens),
+        "compact_tokens": round(compact_tokens),
+        "saved_tokens": round(raw_tokens - compact_tokens),
+        "sampled_docs": sampled,
+    }
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Optional, List, Union
+from typing import Annotated, Dict, Optional, List, Union
+from api.utils.llm_usage import merge_node_usage
 
 class DiagramObject(BaseModel):
     code: str
@@ -20,6 +21,8 @@ class SelectedTechStack(BaseModel):
 class IBAState(BaseModel):
     project_id: str
     architecture_guide: Optional[str] = None
+    guide_overview: Optional[str] = None
+    guide_sections: Optional[Dict[str, str]] = None  # artifact type → detailed insights
     adrs: Optional[List[dict]] = None
     exported_files: Optional[Dict[str, str]] = None
     blueprint_markdown: Optional[str] = None
@@ -34,3 +37,9 @@ class IBAState(BaseModel):
     story_summary: Optional[str] = None
     flow_summary: Optional[str] = None
     entity_summary: Optional[str] = None
+
+    # node → LLM usage (calls, tokens, provider prefix-cache hits); merged across parallel branches
+    llm_usage: Annotated[Optional[Dict[str, Dict]], merge_node_usage] = None
+
+    # node → trace summary (wall time, per-call timings/bytes/retries, tokens, cost); see api.utils.tracing
+    trace: Annotated[Optional[Dict[str, Dict]], merge_node_usage] = None
@@ -1,24 +1,19 @@
-from pymongo import MongoClient
+from api.dal.mongo import get_async_db
 from api.iba.state import IBAState, DiagramObject
 from api.config import get_settings
 from api.utils.emitter import emit_iba_event
-from api.utils.embed_system_diagrams import encode_plantuml
+from api.utils.diagram_images import diagram_image_urls
+from api.utils.tracing import span
 from collections import defaultdict
 
 settings = get_settings()
 
-client = MongoClient(settings.mongodb_uri)
-db = client["Raina"]
-
 DIAGRAM_SUGGESTIONS = {
     "application": ["context", "sequence", "erd", "use_case"],
     "data_pipeline": ["dag", "target_data_model"],
 }
 
-def plantuml_image_url(code: str) -> str:
-    return f"{settings.PLANTUML_SERVER_URL}/svg/{encode_plantuml(code)}"
-
-def embed_system_diagrams(state: IBAState) -> IBAState:
+async def embed_system_diagrams(state: IBAState) -> dict:
     project_id = state.project_id
     paradigm = state.paradigm
 
@@ -31,30 +26,38 @@ def embed_system_diagrams(state: IBAState) -> IBAState:
     )
 
     try:
-        raw_diagrams = list(db["diagrams"].find({"project_id": project_id}))
+        with span("mongo", "diagrams"):
+            raw_diagrams = await get_async_db()["diagrams"].find({"project_id": project_id}).to_list(None)
         if not raw_diagrams:
             raise ValueError("No diagrams found for this project.")
 
         allowed_types = DIAGRAM_SUGGESTIONS.get(paradigm, [])
         filtered = [d for d in raw_diagrams if d.get("diagram_type") in allowed_types]
 
+        # Local render modes produce every image here, in parallel, ahead of the PDF step
+        image_urls = await diagram_image_urls([d["code"] for d in filtered])
+
         diagram_map = defaultdict(list)
-        for d in filtered:
+        for d, image_url in zip(filtered, image_urls):
             diagram_map[d["diagram_type"]].append(
                 DiagramObject(
                     code=d["code"],
-                    image_url=plantuml_image_url(d["code"])
+                    image_url=image_url
                 )
             )
 
-        state.diagrams = dict(diagram_map)
+        diagrams = dict(diagram_map)
 
         emit_iba_event(
             project_id=project_id,
             node="embed_diagrams",
             event_type="iba.node.completed",
             status="completed",
-            metadata={"count": sum(len(v) for v in state.diagrams.values())}
+            metadata={
+                "count": sum(len(v) for v in diagrams.values()),
+                "render": settings.iba_diagram_render,
+                "code_block_fallbacks": image_urls.count(None),
+            }
         )
     except Exception as e:
         emit_iba_event(
@@ -64,6 +67,7 @@ def embed_system_diagrams(state: IBAState) -> IBAState:
             status="failed",
             metadata={"error": str(e)}
         )
-        state.diagrams = {}
+        diagrams = {}
 
-    return state
+    # Parallel branch: only write the field this node owns
+    return {"diagrams": diagrams}
@@ -1,11 +1,23 @@
+from api.iba.chunking import estimate_chunk_plan, pack_by_token_budget
+from api.iba.serialization import compact_artifacts, measure_savings, serialize_artifact_groups
+from api.iba.guide_digest import build_guide_digest
+from api.iba.incremental import chunk_fingerprint, load_chunk_outputs, save_chunk_outputs, template_fingerprint
 from api.iba.state import IBAState
 from api.utils.emitter import emit_iba_event
-from langchain.chat_models import ChatOpenAI
+from api.iba.llm import chat_model_for
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from collections import Counter
+from difflib import SequenceMatcher
 from api.config import get_settings
+from api.utils.concurrency import ChunkFailureError, gather_bounded
+from api.utils.executor import run_blocking
+from api.utils.llm_cache import cached_ainvoke
+from api.utils.llm_usage import LLMUsage
+from api.utils.stream import stream_partial
+import re
 
 settings = get_settings()
 
@@ -21,10 +33,13 @@ class ADRList(BaseModel):
 
 parser = PydanticOutputParser(pydantic_object=ADRList)
 
-CHUNK_PROMPT = ChatPromptTemplate.from_template("""
+# Static instructions and format instructions form a stable prefix shared by every chunk
+# (and every run); the guide digest follows, and the chunk's artifacts come last.
+CHUNK_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """
 You are an experienced software architect.
 
-Based on the following **architecture guide** and **a subset of project artifacts**, generate 1–3 Architectural Decision Records (ADRs).
+Based on the **architecture guide** and **a subset of project artifacts** you are given, generate 1–3 Architectural Decision Records (ADRs).
 
 Each ADR must include:
 - title
@@ -35,39 +50,136 @@ Each ADR must include:
 
 Respond strictly in this format:
 {format_instructions}
-
----
-
+"""),
+    ("human", """
 # Architecture Guide:
 {architecture_guide}
 
 # Artifacts:
 {subset_artifacts}
-""")
+"""),
+]).partial(format_instructions=parser.get_format_instructions())
 
-def chunk_artifacts_globally(artifacts: Dict[str, List[Dict]], max_items: int = 8) -> List[Dict[str, List[Dict]]]:
+def chunk_artifacts_globally(artifacts: Dict[str, List[Dict]], model: str, token_budget: Optional[int] = None) -> List[Dict[str, List[Dict]]]:
+    """Pack documents of all artifact types together into chunks of at most `token_budget` tokens."""
     flat_items = []
     for artifact_type, items in artifacts.items():
         for item in items:
             flat_items.append((artifact_type, item))
 
     chunks = []
-    current_chunk: Dict[str, List[Dict]] = {}
+    for packed in pack_by_token_budget(flat_items, model, token_budget):
+        current_chunk: Dict[str, List[Dict]] = {}
+        for artifact_type, item in packed:
+            current_chunk.setdefault(artifact_type, []).append(item)
+        chunks.append(current_chunk)
 
-    for artifact_type, item in flat_items:
-        if artifact_type not in current_chunk:
-            current_chunk[artifact_type] = []
-        current_chunk[artifact_type].append(item)
+    return chunks
 
-        total_items = sum(len(v) for v in current_chunk.values())
-        if total_items >= max_items:
-            chunks.append(current_chunk)
-            current_chunk = {}
+class _Words:
+    """Normalized words of one ADR field, with the counts used for cheap similarity bounds."""
 
-    if current_chunk:
-        chunks.append(current_chunk)
+    __slots__ = ("words", "counts")
 
-    return chunks
+    def __init__(self, text: str):
+        self.words = tuple(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+        self.counts = Counter(self.words)
+
+def _is_similar(a: _Words, b: _Words, threshold: float) -> bool:
+    """
+    Word-level SequenceMatcher ratio >= threshold. The length bound (real_quick_ratio)
+    and the shared-words bound (quick_ratio) are checked first from precomputed counts,
+    so most pairs are rejected without building a matcher.
+    """
+    la, lb = len(a.words), len(b.words)
+    if not la or not lb:
+        return False
+    if 2.0 * min(la, lb) / (la + lb) < threshold:
+        return False
+    if 2.0 * sum((a.counts & b.counts).values()) / (la + lb) < threshold:
+        return False
+    return SequenceMatcher(None, a.words, b.words, autojunk=False).ratio() >= threshold
+
+def merge_adrs(chunk_adrs: List[List[Dict]], threshold: float = 0.9) -> List[Dict]:
+    """
+    Fold ADRs from different chunks into one list, keeping the first occurrence of
+    each decision. Two ADRs are the same decision when their normalized titles or
+    decisions are identical, or when both title and decision are at least `threshold`
+    similar word for word (so "store raw data in hdfs" and "... in s3" stay apart);
+    empty fields of the kept ADR are filled from its duplicates.
+    """
+    merged: List[Dict] = []
+    keys: List[Tuple[_Words, _Words]] = []
+    by_title: Dict[Tuple[str, ...], int] = {}
+    by_decision: Dict[Tuple[str, ...], int] = {}
+    by_word: Dict[str, List[int]] = {}
+
+    for adrs in chunk_adrs:
+        for adr in adrs:
+            title = _Words(adr.get("title", ""))
+            decision = _Words(adr.get("decision", ""))
+
+            index = by_title.get(title.words) if title.words else None
+            if index is None and decision.words:
+                index = by_decision.get(decision.words)
+            if index is None:
+                # Only ADRs sharing a title word can have a similar title
+                candidates = sorted({i for word in title.counts for i in by_word.get(word, ())})
+                index = next(
+                    (
+                        i for i in candidates
+                        if _is_similar(title, keys[i][0], threshold) and _is_similar(decision, keys[i][1], threshold)
+                    ),
+                    None,
+                )
+
+            if index is None:
+                index = len(merged)
+                merged.append(dict(adr))
+                keys.append((title, decision))
+                if title.words:
+                    by_title.setdefault(title.words, index)
+                if decision.words:
+                    by_decision.setdefault(decision.words, index)
+                for word in title.counts:
+                    by_word.setdefault(word, []).append(index)
+                continue
+
+            kept = merged[index]
+            for field, value in adr.items():
+                if value and not kept.get(field):
+                    kept[field] = value
+
+    return merged
+
+def plan_adr_chunks(state: IBAState, model: str) -> Tuple[List[Dict[str, List[Dict]]], Dict, List[str]]:
+    """Compact, chunk and fingerprint the artifacts; returns (chunks, plan metadata, fingerprints)."""
+    artifacts = compact_artifacts(state.artifacts or {})
+    chunks = chunk_artifacts_globally(artifacts, model=model)
+    plan = {
+        **estimate_chunk_plan([[doc for docs in chunk.values() for doc in docs] for chunk in chunks], model),
+        "serialization": measure_savings(state.artifacts or {}, artifacts, model),
+    }
+
+    # The guide text itself is re-synthesized on every run, so including it would
+    # invalidate every chunk; fingerprint the inputs that shape it instead (paradigm,
+    # tech stack, digest strategy) plus the prompt. Unchanged chunks keep their ADRs.
+    context = {
+        "paradigm": state.paradigm,
+        "tech_stack": state.selected_tech_stack.model_dump() if state.selected_tech_stack else None,
+        "guide_strategy": settings.iba_adr_guide_strategy,
+        "guide_max_tokens": settings.iba_adr_guide_max_tokens,
+        "prompt": template_fingerprint(CHUNK_PROMPT),
+    }
+    fingerprints = [
+        chunk_fingerprint(
+            "generate_adrs", model,
+            [{"type": artifact_type, "doc": doc} for artifact_type, docs in chunk.items() for doc in docs],
+            context,
+        )
+        for chunk in chunks
+    ]
+    return chunks, plan, fingerprints
 
 async def generate_adrs(state: IBAState) -> IBAState:
     emit_iba_event(
@@ -78,42 +190,96 @@ async def generate_adrs(state: IBAState) -> IBAState:
         metadata={"input_preview": state.architecture_guide[:300]}
     )
 
-    llm = ChatOpenAI(
-        temperature=0.3,
-        model="gpt-3.5-turbo",  # ✅ Use cost-effective model
-        openai_api_key=settings.openai_api_key,
+    # Routed to a cost-effective model by default (iba_step_models)
+    llm = chat_model_for("generate_adrs", temperature=0.3)
+
+    # Tokenizing and hashing every artifact is CPU-bound; keep it off the event loop
+    chunks, plan, fingerprints = await run_blocking(plan_adr_chunks, state, llm.model_name)
+
+    # Built once per run; each chunk gets the digest (or its relevant sections) instead of the full guide
+    usage = LLMUsage()
+    guide_digest = await build_guide_digest(state, llm, usage=usage)
+
+    emit_iba_event(
+        project_id=state.project_id,
+        node="generate_adrs",
+        event_type="iba.chunk.plan",
+        status="planned",
+        metadata={
+            **plan,
+            "guide_strategy": guide_digest.strategy,
+            "guide_digest_tokens": guide_digest.tokens(),
+        }
     )
 
-    chunks = chunk_artifacts_globally(state.artifacts, max_items=8)
-    all_adrs = []
+    previous_outputs = await load_chunk_outputs(state.project_id, "generate_adrs")
 
-    for i, chunk in enumerate(chunks):
-        try:
+    def make_chunk_task(index: int, chunk: Dict[str, List[Dict]], fp: str):
+        async def generate() -> List[Dict]:
+            if fp in previous_outputs:
+                return previous_outputs[fp]
             messages = CHUNK_PROMPT.format_messages(
-                format_instructions=parser.get_format_instructions(),
-                architecture_guide=state.architecture_guide or "N/A",
-                subset_artifacts=chunk
+                architecture_guide=guide_digest.for_chunk(chunk.keys()),
+                subset_artifacts=serialize_artifact_groups(chunk)
             )
-            result = await llm.ainvoke(messages)
+            # Unparseable replies are not cached, so a retry asks the LLM again
+            result = await cached_ainvoke(llm, messages, usage, validate=parser.parse)
             parsed = parser.parse(result.content)
-            all_adrs.extend([adr.model_dump() for adr in parsed.adrs])
-        except Exception as e:
+            return [adr.model_dump() for adr in parsed.adrs]
+
+        async def run() -> List[Dict]:
+            adrs = await generate()
+            stream_partial("generate_adrs", "adr_chunk", adrs, chunk_index=index)
+            return adrs
+        return run
+
+    results = await gather_bounded(
+        [make_chunk_task(i, chunk, fp) for i, (chunk, fp) in enumerate(zip(chunks, fingerprints))],
+        limit=settings.iba_llm_concurrency,
+    )
+
+    chunk_adrs: List[List[Dict]] = []
+    outputs: Dict[str, List[Dict]] = {}
+    failed: Dict[int, BaseException] = {}
+    for i, (fp, result) in enumerate(zip(fingerprints, results)):
+        if isinstance(result, BaseException):
+            failed[i] = result
             emit_iba_event(
                 project_id=state.project_id,
                 node="generate_adrs",
                 event_type="iba.chunk.failed",
-                status="warning",
-                metadata={"chunk_index": i, "error": str(e)}
+                status="failed",
+                metadata={"chunk_index": i, "error": str(result) or type(result).__name__}
             )
+            continue
+        chunk_adrs.append(result)
+        outputs[fp] = result
+
+    # Keep what succeeded so a retried run only regenerates the failed chunks
+    await save_chunk_outputs(state.project_id, "generate_adrs", outputs)
+    if failed:
+        raise ChunkFailureError("generate_adrs", failed, len(chunks))
+    reused = sum(1 for fp in fingerprints if fp in previous_outputs)
+
+    raw_count = sum(len(adrs) for adrs in chunk_adrs)
+    # Pairwise similarity is quadratic in the number of ADRs
+    all_adrs = await run_blocking(merge_adrs, chunk_adrs, threshold=settings.iba_adr_dedupe_threshold)
 
     state.adrs = all_adrs
+    state.llm_usage = {"generate_adrs": usage.as_dict()}
 
     emit_iba_event(
         project_id=state.project_id,
         node="generate_adrs",
         event_type="iba.node.completed",
         status="completed",
-        metadata={"count": len(all_adrs)}
+        metadata={
+            "count": len(all_adrs),
+            "merged": raw_count - len(all_adrs),
+            "chunks": len(chunks),
+            "chunks_reused": reused,
+            "llm_usage": usage.as_dict(),
+        }
     )
 
     return state
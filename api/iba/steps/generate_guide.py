@@ -1,21 +1,31 @@
 
+from api.iba.chunking import estimate_chunk_plan, pack_by_token_budget
+from api.iba.serialization import compact_artifacts, measure_savings, serialize_artifacts
+from api.iba.incremental import chunk_fingerprint, load_chunk_outputs, save_chunk_outputs, template_fingerprint
 from api.iba.state import IBAState
 from api.utils.emitter import emit_iba_event
-from langchain.chat_models import ChatOpenAI
+from api.iba.llm import chat_model_for
 from langchain.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from api.config import get_settings
-from typing import List, Dict
+from api.utils.concurrency import ChunkFailureError, gather_bounded
+from api.utils.executor import run_blocking
+from api.utils.llm_cache import cached_ainvoke
+from api.utils.llm_usage import LLMUsage
+from api.utils.stream import stream_partial
+from typing import List, Dict, Optional, Tuple
 
 settings = get_settings()
 
-GENERIC_CHUNK_PROMPT = ChatPromptTemplate.from_template(
-    """
-You are a software architect.
+DETAILS_HEADING = "## Detailed Artifact Definitions"
 
-The project follows the paradigm: "{paradigm}".
+# Prompts are laid out for provider-side prefix caching: the static instructions come
+# first (system message), then per-run context, and the per-chunk data always last.
+
+GENERIC_CHUNK_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """
+You are a software architect.
 
-Below is a list of **{artifact_type}** project artifacts. For this artifact type, describe:
+You will be given the project's paradigm and a list of project artifacts of one type. For this artifact type, describe:
 
 - What this artifact represents
 - How it influences architecture and system design
@@ -23,18 +33,36 @@ Below is a list of **{artifact_type}** project artifacts. For this artifact type
 - Specific examples if relevant
 
 Respond in **Markdown** using a heading for the artifact type and bullet points for insights.
+"""),
+    ("human", """
+The project follows the paradigm: "{paradigm}".
 
 ## {artifact_type} Artifacts
-```json
+```
 {artifact_chunk}
 ```
-"""
-)
+"""),
+])
 
-FINAL_PROMPT = ChatPromptTemplate.from_template(
-    """
+FINAL_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """
 You are a senior software architect.
 
+You will be given the software paradigm, the selected tech stack, summaries of key project artifacts
+and detailed artifact-level insights.
+
+Using that information, write a comprehensive **Architecture Guide** that includes:
+
+1. High-level architectural overview
+2. Key components and responsibilities tailored to the paradigm
+3. Design patterns and principles based on the selected tech stack and domain
+4. Scalability, reliability, observability, maintainability
+5. Data or integration flow strategies
+6. A brief section summarizing the artifacts with references to their details
+
+Respond in **Markdown** with clear headings. Do not repeat generic patterns like microservices if not suitable for data pipelines.
+"""),
+    ("human", """
 The software paradigm is: **{paradigm}**
 
 The selected tech stack is:
@@ -52,37 +80,60 @@ Below are summaries of key project artifacts:
 ### Flows:
 {flow_summary}
 
-Below that, you will find detailed artifact-level insights.
-
----
-
-Using the information above, write a comprehensive **Architecture Guide** that includes:
-
-1. High-level architectural overview
-2. Key components and responsibilities tailored to the paradigm
-3. Design patterns and principles based on the selected tech stack and domain
-4. Scalability, reliability, observability, maintainability
-5. Data or integration flow strategies
-6. A brief section summarizing the artifacts with references to their details
-
-Respond in **Markdown** with clear headings. Do not repeat generic patterns like microservices if not suitable for data pipelines.
 ---
 
 ## Detailed Artifact Insights
 {chunk_insights}
-"""
-)
+"""),
+])
 
-def chunk_artifacts(artifacts: dict, max_per_chunk: int = 3) -> List[Dict]:
+def chunk_artifacts(artifacts: dict, model: str, token_budget: Optional[int] = None) -> List[Dict]:
+    """Pack each artifact type's documents into chunks of at most `token_budget` tokens."""
     chunks = []
     for artifact_type, items in artifacts.items():
-        for i in range(0, len(items), max_per_chunk):
+        for packed in pack_by_token_budget([(artifact_type, item) for item in items], model, token_budget):
             chunks.append({
                 "artifact_type": artifact_type,
-                "artifact_chunk": items[i : i + max_per_chunk]
+                "artifact_chunk": [doc for _, doc in packed]
             })
     return chunks
 
+def render_entity_chunk(entities: List[Dict]) -> str:
+    entity_md_blocks = []
+    for entity in entities:
+        name = entity.get("name", "Unknown")
+        description = entity.get("description", "")
+        attributes = entity.get("attributes", [])
+        attr_lines = [
+            f"- **{attr.get('name', '')}** (`{attr.get('type', '')}`): {attr.get('description', '')}"
+            for attr in attributes
+        ]
+        entity_md = "\n".join([
+            f"### Entity: {name}",
+            f"_Description_: {description}_\n",
+            "\n".join(attr_lines),
+            ""
+        ])
+        entity_md_blocks.append(entity_md)
+    return "\n".join(entity_md_blocks)
+
+def plan_guide_chunks(state: IBAState, model: str) -> Tuple[List[Dict], Dict, List[str]]:
+    """Compact, chunk and fingerprint the artifacts; returns (chunks, plan metadata, fingerprints)."""
+    artifacts = compact_artifacts(state.artifacts or {})
+    chunks = chunk_artifacts(artifacts, model=model)
+
+    # Entity chunks are rendered locally; only the rest cost an LLM call
+    plan = {
+        **estimate_chunk_plan([c["artifact_chunk"] for c in chunks if c["artifact_type"] != "entities"], model),
+        "serialization": measure_savings(state.artifacts or {}, artifacts, model),
+    }
+    prompt = template_fingerprint(GENERIC_CHUNK_PROMPT)
+    fingerprints = [
+        chunk_fingerprint("generate_guide", model, chunk["artifact_chunk"], state.paradigm, chunk["artifact_type"], prompt)
+        for chunk in chunks
+    ]
+    return chunks, plan, fingerprints
+
 async def generate_architecture_guide(state: IBAState) -> IBAState:
     emit_iba_event(
         project_id=state.project_id,
@@ -92,72 +143,92 @@ async def generate_architecture_guide(state: IBAState) -> IBAState:
         metadata={"paradigm": state.paradigm}
     )
 
+    usage = LLMUsage()
+
     try:
-        model = ChatOpenAI(
-            temperature=0.3,
-            model=settings.openai_model,
-            openai_api_key=settings.openai_api_key,
-        )
+        model = chat_model_for("generate_guide", temperature=0.3)
 
-        generic_chain = GENERIC_CHUNK_PROMPT | model | StrOutputParser()
-        final_chain = FINAL_PROMPT | model | StrOutputParser()
+        # Tokenizing and hashing every artifact is CPU-bound; keep it off the event loop
+        chunks, plan, fingerprints = await run_blocking(plan_guide_chunks, state, model.model_name)
 
-        chunks = chunk_artifacts(state.artifacts)
-        chunk_guides: List[str] = []
+        emit_iba_event(
+            project_id=state.project_id,
+            node="generate_guide",
+            event_type="iba.chunk.plan",
+            status="planned",
+            metadata=plan
+        )
+        previous_outputs = await load_chunk_outputs(state.project_id, "generate_guide")
 
-        for i, chunk in enumerate(chunks):
-            try:
+        def make_chunk_task(index: int, chunk: Dict, fp: str):
+            async def generate() -> str:
+                if fp in previous_outputs:
+                    return previous_outputs[fp]
                 artifact_type = chunk["artifact_type"]
                 if artifact_type == "entities":
-                    entity_md_blocks = []
-                    for entity in chunk["artifact_chunk"]:
-                        name = entity.get("name", "Unknown")
-                        description = entity.get("description", "")
-                        attributes = entity.get("attributes", [])
-                        attr_lines = [
-                            f"- **{attr.get('name', '')}** (`{attr.get('type', '')}`): {attr.get('description', '')}"
-                            for attr in attributes
-                        ]
-                        entity_md = "\n".join([
-                            f"### Entity: {name}",
-                            f"_Description_: {description}_\n",
-                            "\n".join(attr_lines),
-                            ""
-                        ])
-                        entity_md_blocks.append(entity_md)
-                    chunk_text = "\n".join(entity_md_blocks)
-                    chunk_guides.append("## Entity Definitions\n" + chunk_text)
-                else:
-                    chunk_text = await generic_chain.ainvoke({
-                        "paradigm": state.paradigm,
-                        "artifact_type": artifact_type,
-                        "artifact_chunk": chunk["artifact_chunk"]
-                    })
-                    chunk_guides.append(chunk_text)
-            except Exception as ce:
+                    return "## Entity Definitions\n" + render_entity_chunk(chunk["artifact_chunk"])
+                messages = GENERIC_CHUNK_PROMPT.format_messages(
+                    paradigm=state.paradigm,
+                    artifact_type=artifact_type,
+                    artifact_chunk=serialize_artifacts(chunk["artifact_chunk"])
+                )
+                return (await cached_ainvoke(model, messages, usage)).content
+
+            async def run() -> str:
+                text = await generate()
+                stream_partial("generate_guide", "guide_chunk", text, chunk_index=index, artifact_type=chunk["artifact_type"])
+                return text
+            return run
+
+        # Fan out per-chunk insights; results come back in chunk order
+        results = await gather_bounded(
+            [make_chunk_task(i, chunk, fp) for i, (chunk, fp) in enumerate(zip(chunks, fingerprints))],
+            limit=settings.iba_llm_concurrency,
+        )
+
+        chunk_guides: List[str] = []
+        sections: Dict[str, List[str]] = {}
+        outputs: Dict[str, str] = {}
+        failed: Dict[int, BaseException] = {}
+        for i, (fp, result) in enumerate(zip(fingerprints, results)):
+            if isinstance(result, BaseException):
+                failed[i] = result
                 emit_iba_event(
                     project_id=state.project_id,
                     node="generate_guide",
                     event_type="iba.chunk.failed",
-                    status="warning",
-                    metadata={"chunk_index": i, "error": str(ce)}
+                    status="failed",
+                    metadata={"chunk_index": i, "error": str(result) or type(result).__name__}
                 )
+                continue
+            chunk_guides.append(result)
+            sections.setdefault(chunks[i]["artifact_type"], []).append(result)
+            outputs[fp] = result
+
+        # Keep what succeeded so a retried run only regenerates the failed chunks
+        await save_chunk_outputs(state.project_id, "generate_guide", outputs)
+        if failed:
+            raise ChunkFailureError("generate_guide", failed, len(chunks))
+        reused = sum(1 for fp in fingerprints if fp in previous_outputs)
 
         full_chunk_insights = "\n\n".join(chunk_guides)
 
-        final_guide = await final_chain.ainvoke({
-            "paradigm": state.paradigm or "application",
-            "tech_stack": state.selected_tech_stack.model_dump_json(indent=2) if state.selected_tech_stack else "{}",
-            "story_summary": state.story_summary or "No user stories provided.",
-            "entity_summary": state.entity_summary or "No entities provided.",
-            "flow_summary": state.flow_summary or "No flows provided.",
-            "chunk_insights": full_chunk_insights
-        })
+        final_messages = FINAL_PROMPT.format_messages(
+            paradigm=state.paradigm or "application",
+            tech_stack=state.selected_tech_stack.model_dump_json(indent=2) if state.selected_tech_stack else "{}",
+            story_summary=state.story_summary or "No user stories provided.",
+            entity_summary=state.entity_summary or "No entities provided.",
+            flow_summary=state.flow_summary or "No flows provided.",
+            chunk_insights=full_chunk_insights
+        )
+        final_guide = (await cached_ainvoke(model, final_messages, usage)).content
 
+        state.guide_overview = final_guide.strip()
+        state.guide_sections = {artifact_type: "\n\n".join(texts) for artifact_type, texts in sections.items()}
         state.architecture_guide = (
-            final_guide.strip()
+            state.guide_overview
             + "\n\n---\n\n"
-            + "## Detailed Artifact Definitions\n\n"
+            + DETAILS_HEADING + "\n\n"
             + full_chunk_insights
         )
 
@@ -166,7 +237,12 @@ async def generate_architecture_guide(state: IBAState) -> IBAState:
             node="generate_guide",
             event_type="iba.node.completed",
             status="completed",
-            metadata={"output_preview": state.architecture_guide[:500]}
+            metadata={
+                "output_preview": state.architecture_guide[:500],
+                "chunks": len(chunks),
+                "chunks_reused": reused,
+                "llm_usage": usage.as_dict(),
+            }
         )
 
     except Exception as e:
@@ -177,6 +253,10 @@ async def generate_architecture_guide(state: IBAState) -> IBAState:
             status="failed",
             metadata={"error": str(e)}
         )
+        if isinstance(e, ChunkFailureError):
+            # A guide missing some artifacts' insights must fail the run, not ship incomplete
+            raise
         state.architecture_guide = "# Architecture Guide\n\n_An error occurred during generation._"
 
+    state.llm_usage = {"generate_guide": usage.as_dict()}
     return state
@@ -1,8 +1,10 @@
 
 from api.iba.state import IBAState, DiagramObject
 from api.utils.emitter import emit_iba_event
-from api.utils.embed_system_diagrams import encode_plantuml
-from langchain.chat_models import ChatOpenAI
+from api.utils.diagram_images import diagram_image_urls
+from api.utils.llm_cache import cached_ainvoke
+from api.utils.llm_usage import LLMUsage
+from api.iba.llm import chat_model_for
 from langchain.prompts import ChatPromptTemplate
 import logging
 
@@ -86,11 +88,25 @@ User --> [{{frontend}}]
 No explanation.
 """)
 
-def plantuml_image_url(code: str) -> str:
-    from api.config import get_settings
-    return f"{get_settings().PLANTUML_SERVER_URL}/svg/{encode_plantuml(code)}"
+def extract_diagram(content: str, paradigm: str) -> str:
+    """PlantUML code from the LLM response, titled; raises ValueError if it is not a diagram."""
+    result = content.strip()
+    if "```plantuml" in result:
+        result = result.split("```plantuml")[1].split("```")[0].strip()
+
+    lines = result.splitlines()
+    if lines and "@startuml" in lines[0]:
+        lines.insert(1, f"title {paradigm} System Architecture")
+    result = "\n".join(lines)
+
+    if not result.startswith("@startuml") or not result.endswith("@enduml"):
+        raise ValueError("Generated diagram is not valid PlantUML")
+    return result
+
+async def generate_system_diagram(state: IBAState) -> dict:
+    update = {}
+    usage = LLMUsage()
 
-def generate_system_diagram(state: IBAState) -> IBAState:
     emit_iba_event(
         project_id=state.project_id,
         node="generate_system_diagram",
@@ -119,30 +135,26 @@ def generate_system_diagram(state: IBAState) -> IBAState:
             other_tools=", ".join(stack.other_tools or []),
         )
 
-        llm = ChatOpenAI(model="gpt-4", temperature=0)
-        result = llm.invoke(prompt).content.strip()
-
-        if "```plantuml" in result:
-            result = result.split("```plantuml")[1].split("```")[0].strip()
-
-        lines = result.splitlines()
-        if "@startuml" in lines[0]:
-            lines.insert(1, f"title {paradigm} System Architecture")
-        result = "\n".join(lines)
-
-        if not result.startswith("@startuml") or not result.endswith("@enduml"):
-            raise ValueError("Generated diagram is not valid PlantUML")
-
-        state.system_diagram = DiagramObject(
-            code=result, image_url=plantuml_image_url(result)
+        llm = chat_model_for("generate_system_diagram", temperature=0)
+        # Invalid diagrams are not cached, so the next run asks the LLM again
+        response = await cached_ainvoke(
+            llm, prompt, usage, validate=lambda content: extract_diagram(content, paradigm)
         )
+        result = extract_diagram(response.content, paradigm)
+
+        image_url = (await diagram_image_urls([result]))[0]
+        update["system_diagram"] = DiagramObject(code=result, image_url=image_url)
 
         emit_iba_event(
             project_id=state.project_id,
             node="generate_system_diagram",
             event_type="iba.node.completed",
             status="completed",
-            metadata={"length": len(result)},
+            metadata={
+                "length": len(result),
+                "image": "code_block" if image_url is None else "image",
+                "llm_usage": usage.as_dict(),
+            },
         )
 
     except Exception as e:
@@ -155,4 +167,7 @@ def generate_system_diagram(state: IBAState) -> IBAState:
             metadata={"error": str(e)},
         )
 
-    return state
+    update["llm_usage"] = {"generate_system_diagram": usage.as_dict()}
+
+    # Parallel branch: only write the fields this node owns
+    return update
@@ -1,7 +1,9 @@
-from langchain.chat_models import ChatOpenAI
+from api.iba.llm import chat_model_for
 from langchain_core.output_parsers import StrOutputParser
 from langchain.prompts import ChatPromptTemplate
 from api.iba.state import IBAState
+from api.utils.llm_cache import cached_ainvoke
+from api.utils.llm_usage import LLMUsage
 
 TECH_STACK_GUIDANCE_PROMPT = ChatPromptTemplate.from_template("""
 You are a senior data platform engineer and full-stack cloud architect.
@@ -51,7 +53,7 @@ The system is built using the following tech stack:
 Return the output in clean, sectioned markdown format using headers and bullet points.
 """)
 
-def generate_tech_stack_guidance(state: IBAState) -> IBAState:
+async def generate_tech_stack_guidance(state: IBAState) -> dict:
     selected = state.selected_tech_stack
 
     # Safely extract artifact summaries
@@ -79,9 +81,10 @@ def generate_tech_stack_guidance(state: IBAState) -> IBAState:
         other_keys=", ".join(other_keys) or "None"
     )
 
-    model = ChatOpenAI(temperature=0.3)
-    response = model.invoke(prompt)
+    model = chat_model_for("generate_tech_stack_guidance", temperature=0.3)
+    usage = LLMUsage()
+    response = await cached_ainvoke(model, prompt, usage)
     output = StrOutputParser().parse(response.content)
 
-    state.tech_stack_guidance = output
-    return state
+    # Parallel branch: only write the field this node owns
+    return {"tech_stack_guidance": output, "llm_usage": {"generate_tech_stack_guidance": usage.as_dict()}}
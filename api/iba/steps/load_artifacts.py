@@ -2,7 +2,7 @@ from api.dal.project_map_loader import load_project_artifacts
 from api.iba.state import IBAState, SelectedTechStack
 from api.utils.emitter import emit_iba_event
 
-def load_artifacts(state: IBAState) -> IBAState:
+async def load_artifacts(state: IBAState) -> IBAState:
     emit_iba_event(
         project_id=state.project_id,
         node="load_artifacts",
@@ -12,7 +12,7 @@ def load_artifacts(state: IBAState) -> IBAState:
     )
 
     try:
-        paradigm, artifacts, project_map = load_project_artifacts(state.project_id)
+        paradigm, artifacts, project_map, timings = await load_project_artifacts(state.project_id)
         state.paradigm = paradigm
         state.artifacts = artifacts
 
@@ -29,7 +29,8 @@ def load_artifacts(state: IBAState) -> IBAState:
             metadata={
                 "paradigm": paradigm,
                 "artifact_keys": list(artifacts.keys()),
-                "has_tech_stack": bool(selected_stack)
+                "has_tech_stack": bool(selected_stack),
+                "timings_ms": timings
             }
         )
 
@@ -1,19 +1,15 @@
+from api.config import get_settings
 from api.iba.state import IBAState
 from api.utils.emitter import emit_iba_event
+from api.utils.executor import run_blocking
+from api.utils.pdf_renderer import defer, render_pdf
+from api.utils.tracing import span
 from datetime import datetime
+from typing import Optional, Tuple
 import os
-import markdown2
-import pdfkit
-
-def render_final_output(state: IBAState) -> IBAState:
-    emit_iba_event(
-        project_id=state.project_id,
-        node="render_output",
-        event_type="iba.node.started",
-        status="started",
-        metadata={}
-    )
 
+def _render_blueprint(state: IBAState) -> Tuple[str, str]:
+    """Build the blueprint markdown and write it; returns (markdown, md_path). Blocking."""
     guide = state.architecture_guide or "# Architecture Guide\n_Not available_"
     diagrams = state.diagrams or {}
     adrs = state.adrs or []
@@ -81,67 +77,65 @@ def render_final_output(state: IBAState) -> IBAState:
     os.makedirs(output_dir, exist_ok=True)
 
     md_path = os.path.join(output_dir, filename + ".md")
-    with open(md_path, "w", encoding="utf-8") as f:
+    with span("render", "markdown") as call_span, open(md_path, "w", encoding="utf-8") as f:
         f.write(markdown)
+        call_span.add_bytes(f.tell())
+
+    return markdown, md_path
 
-    pdf_path = None
+async def _export_pdf(project_id: str, markdown: str, pdf_path: str, deferred: bool = False) -> Optional[str]:
+    """Render the PDF in the renderer pool; returns its path, or None (with iba.pdf.failed) on error."""
     try:
-        html_content = markdown2.markdown(markdown, extras=["fenced-code-blocks"])
-
-        styled_html = f"""
-        <html>
-        <head>
-        <style>
-            body {{
-                font-family: 'Segoe UI', 'Helvetica Neue', Helvetica, Arial, sans-serif;
-                font-size: 12pt;
-                line-height: 1.6;
-                color: #1a1a1a;
-                padding: 2em;
-            }}
-            h1, h2, h3, h4 {{
-                font-weight: bold;
-                color: #0b0c0c;
-            }}
-            code, pre {{
-                font-family: 'Courier New', monospace;
-                background-color: #f4f4f4;
-                padding: 0.3em;
-                border-radius: 4px;
-            }}
-            ul, ol {{
-                margin-left: 1.2em;
-            }}
-        </style>
-        </head>
-        <body>
-        {html_content}
-        </body>
-        </html>
-        """
-
-        pdf_path = os.path.join(output_dir, filename + ".pdf")
-        pdfkit.from_string(
-            styled_html,
-            pdf_path,
-            options={
-                "enable-local-file-access": "",
-                "quiet": ""
-            }
-        )
+        with span("render", "pdf") as call_span:
+            call_span.add_bytes(await render_pdf(markdown, pdf_path))
     except Exception as e:
         emit_iba_event(
-            project_id=state.project_id,
+            project_id=project_id,
             node="render_output",
             event_type="iba.pdf.failed",
             status="warning",
             metadata={"error": str(e)}
         )
+        return None
+
+    if deferred:
+        emit_iba_event(
+            project_id=project_id,
+            node="render_output",
+            event_type="iba.pdf.completed",
+            status="completed",
+            metadata={"pdf_file": pdf_path}
+        )
+    return pdf_path
+
+async def render_final_output(state: IBAState) -> IBAState:
+    emit_iba_event(
+        project_id=state.project_id,
+        node="render_output",
+        event_type="iba.node.started",
+        status="started",
+        metadata={}
+    )
+
+    # File writes block; keep them off the event loop
+    markdown, md_path = await run_blocking(_render_blueprint, state)
 
     state.blueprint_markdown = markdown
     exported = {"markdown": md_path}
-    if pdf_path:
+
+    pdf_mode = get_settings().iba_pdf_mode
+    pdf_path = os.path.splitext(md_path)[0] + ".pdf"
+    if pdf_mode == "sync":
+        pdf_path = await _export_pdf(state.project_id, markdown, pdf_path)
+        if pdf_path:
+            exported["pdf"] = pdf_path
+    elif pdf_mode == "deferred":
+        # iba.pdf.completed (or iba.pdf.failed) reports when the file is ready
+        defer(_export_pdf(state.project_id, markdown, pdf_path, deferred=True))
         exported["pdf"] = pdf_path
+        exported["pdf_status"] = "pending"
+    else:
+        pdf_path = None
     state.exported_files = exported
 
     emit_iba_event(
@@ -152,7 +146,8 @@ def render_final_output(state: IBAState) -> IBAState:
         metadata={
             "length": len(markdown),
             "markdown_file": md_path,
-            "pdf_file": pdf_path if pdf_path else "N/A"
+            "pdf_file": pdf_path if pdf_path else "N/A",
+            "pdf_mode": pdf_mode,
         }
     )
 
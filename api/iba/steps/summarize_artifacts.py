@@ -19,7 +19,7 @@ def summarize_stories(stories: list[dict]) -> str:
     return "\n".join(f"- {s.get('summary', 'Unnamed')} — {s.get('description', '')}" for s in stories) or "No stories defined."
 
 
-def summarize_artifacts(state: IBAState) -> IBAState:
+async def summarize_artifacts(state: IBAState) -> dict:
     emit_iba_event(
         project_id=state.project_id,
         node="summarize_artifacts",
@@ -29,9 +29,12 @@ def summarize_artifacts(state: IBAState) -> IBAState:
 
     artifacts = state.artifacts or {}
 
-    state.entity_summary = summarize_entities(artifacts.get("entities", []))
-    state.flow_summary = summarize_flows(artifacts.get("flows", []))
-    state.story_summary = summarize_stories(artifacts.get("stories", []))
+    # Runs alongside the diagram/tech-stack branches, so only return the fields it owns
+    update = {
+        "entity_summary": summarize_entities(artifacts.get("entities", [])),
+        "flow_summary": summarize_flows(artifacts.get("flows", [])),
+        "story_summary": summarize_stories(artifacts.get("stories", [])),
+    }
 
     emit_iba_event(
         project_id=state.project_id,
@@ -44,4 +47,4 @@ def summarize_artifacts(state: IBAState) -> IBAState:
             "story_len": len(artifacts.get("stories", [])),
         }
     )
-    return state
+    return update
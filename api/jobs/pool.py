@@ -0,0 +1,274 @@
+from api.config import get_settings
+from api.iba.runner import run_blueprint
+from api.jobs import store
+from api.utils.rabbitmq import get_publisher
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pika.exceptions import AMQPError
+from typing import Callable, Dict, List, Optional
+import asyncio
+import itertools
+import json
+import logging
+import pika
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MAX_PRIORITY = 9
+
+@dataclass(order=True)
+class QueuedJob:
+    sort_key: tuple
+    job_id: str = field(compare=False)
+    project_id: str = field(compare=False)
+    tenant_id: str = field(compare=False)
+    on_done: Optional[Callable[[], None]] = field(default=None, compare=False)
+    requeue: Optional[Callable[[], None]] = field(default=None, compare=False)
+
+class JobWorkerPool:
+    """
+    Runs queued IBA jobs on a fixed number of worker tasks.
+
+    Jobs come from a local priority queue ("local" backend) or from a durable
+    RabbitMQ priority queue ("rabbitmq" backend, consumed on a background thread
+    and acked once the job finishes). Either way they are dispatched highest
+    priority first, and at most `tenant_concurrency` jobs per tenant run at once.
+    A tenant's extra local jobs wait until one of its running jobs finishes; extra
+    broker jobs are nacked back to the queue so they do not hold prefetch slots
+    that other tenants' jobs could use.
+
+    A job runs only once the worker claims it in the store (see api.jobs.store):
+    redelivered messages for finished jobs are dropped, and jobs still leased to a
+    live worker are retried later. Jobs interrupted by stop() go back to queued;
+    the local backend re-enqueues unfinished jobs when it starts.
+    """
+
+    def __init__(self, backend: str, workers: int, tenant_concurrency: int):
+        if backend not in ("local", "rabbitmq"):
+            raise ValueError(f"Unknown job backend: {backend}")
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.tenant_concurrency = max(1, tenant_concurrency)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._running: Dict[str, int] = defaultdict(int)
+        self._deferred: Dict[str, deque] = defaultdict(deque)
+        self._stopping = threading.Event()
+        self._consumer: Optional[threading.Thread] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"iba-job-worker-{i}") for i in range(self.workers)]
+        if self.backend == "local":
+            # Local jobs only live in memory; pick up what the last process left unfinished
+            jobs = await store.unfinished_jobs()
+            for job in jobs:
+                self._enqueue(job["_id"], job["project_id"], job.get("tenant_id", "default"), job.get("priority", 0))
+            if jobs:
+                logger.info(f"[IBA] Re-enqueued {len(jobs)} unfinished job(s)")
+        if self.backend == "rabbitmq":
+            self._stopping.clear()
+            self._consumer = threading.Thread(target=self._consume, name="iba-job-consumer", daemon=True)
+            self._consumer.start()
+
+    async def stop(self):
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._consumer is not None:
+            await asyncio.to_thread(self._consumer.join, 5)
+            self._consumer = None
+
+    async def submit(self, project_id: str, tenant_id: str = "default", priority: int = 0) -> Dict:
+        priority = min(max(priority, 0), MAX_PRIORITY)
+        job = await store.create_job(project_id, tenant_id, priority)
+        if self.backend == "rabbitmq":
+            message = {"job_id": job["_id"], "project_id": project_id, "tenant_id": tenant_id}
+            try:
+                await asyncio.to_thread(
+                    get_publisher().publish, message, settings.iba_job_routing_key, priority=priority
+                )
+            except Exception as e:
+                # No message means nothing would ever run it; don't leave it queued
+                await store.mark_failed(job["_id"], f"Could not queue the job: {str(e)}")
+                raise
+        else:
+            self._enqueue(job["_id"], project_id, tenant_id, priority)
+        return job
+
+    def _enqueue(self, job_id: str, project_id: str, tenant_id: str, priority: int,
+                 on_done: Optional[Callable[[], None]] = None,
+                 requeue: Optional[Callable[[], None]] = None):
+        self._queue.put_nowait(
+            QueuedJob((-priority, next(self._seq)), job_id, project_id, tenant_id, on_done, requeue)
+        )
+
+    @staticmethod
+    def _settle(job: QueuedJob, callback: Callable[[], None]):
+        # Acks/nacks go to the channel that delivered the job; after a reconnect that
+        # channel is closed and pika raises. The broker redelivers the message anyway.
+        try:
+            callback()
+        except Exception:
+            logger.exception(f"[IBA] Could not settle the broker delivery for job {job.job_id}")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if self._running[job.tenant_id] >= self.tenant_concurrency:
+                    if job.requeue:
+                        self._retry_later(job)
+                    else:
+                        self._deferred[job.tenant_id].append(job)
+                    continue
+
+                self._running[job.tenant_id] += 1
+                try:
+                    await self._run(job)
+                finally:
+                    self._running[job.tenant_id] -= 1
+                    if self._deferred[job.tenant_id]:
+                        self._queue.put_nowait(self._deferred[job.tenant_id].popleft())
+            finally:
+                self._queue.task_done()
+
+    def _retry_later(self, job: QueuedJob):
+        if job.requeue:
+            # Back to the broker, so the delivery does not hold a prefetch slot meanwhile
+            self._loop.call_later(settings.iba_job_requeue_delay_seconds, self._settle, job, job.requeue)
+        else:
+            self._loop.call_later(settings.iba_job_lease_seconds, self._queue.put_nowait, job)
+
+    async def _keep_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(settings.iba_job_lease_seconds / 3)
+            try:
+                await store.renew_lease(job_id, settings.iba_job_lease_seconds)
+            except Exception:
+                logger.exception(f"[IBA] Could not renew the lease of job {job_id}")
+
+    async def _run(self, job: QueuedJob):
+        settle = job.on_done
+        claimed = False
+        try:
+            claim = await store.claim_job(job.job_id, settings.iba_job_lease_seconds)
+            if claim == store.BUSY:
+                # Leased to another worker; if that worker died, the lease runs out and we take over
+                settle = None
+                self._retry_later(job)
+                return
+            if claim == store.FINISHED:
+                logger.info(f"[IBA] Job {job.job_id} already finished; skipping")
+                return
+
+            claimed = True
+            logger.info(f"[IBA] Job {job.job_id} started for project {job.project_id} (tenant {job.tenant_id})")
+            heartbeat = asyncio.create_task(self._keep_lease(job.job_id))
+            try:
+                result = await run_blueprint(job.project_id)
+            finally:
+                heartbeat.cancel()
+            await store.mark_completed(job.job_id, result)
+        except asyncio.CancelledError:
+            # stop(): hand the job back so the next start (or the broker's redelivery) runs it
+            settle = job.requeue
+            if claimed:
+                try:
+                    await store.release_job(job.job_id)
+                except Exception:
+                    logger.exception(f"[IBA] Could not release interrupted job {job.job_id}")
+            raise
+        except Exception as e:
+            logger.exception(f"[IBA] Job {job.job_id} failed")
+            try:
+                await store.mark_failed(job.job_id, f"IBA agent execution failed: {str(e)}")
+            except Exception:
+                logger.exception(f"[IBA] Could not record failure for job {job.job_id}")
+        finally:
+            if settle:
+                self._settle(job, settle)
+
+    def _consume(self):
+        while not self._stopping.is_set():
+            try:
+                connection = pika.BlockingConnection(
+                    pika.ConnectionParameters(host=settings.rabbitmq_host, heartbeat=settings.rabbitmq_heartbeat)
+                )
+                channel = connection.channel()
+                channel.exchange_declare(
+                    exchange=settings.rabbitmq_exchange,
+                    exchange_type=settings.rabbitmq_exchange_type,
+                    durable=True,
+                    auto_delete=False
+                )
+                channel.queue_declare(
+                    queue=settings.iba_job_queue, durable=True, arguments={"x-max-priority": MAX_PRIORITY}
+                )
+                channel.queue_bind(
+                    queue=settings.iba_job_queue,
+                    exchange=settings.rabbitmq_exchange,
+                    routing_key=settings.iba_job_routing_key
+                )
+                # Unacked deliveries are bounded by the worker count; the rest stay in the broker
+                # queue, and jobs over their tenant's limit are handed back (see _worker)
+                channel.basic_qos(prefetch_count=self.workers)
+
+                for method, properties, body in channel.consume(settings.iba_job_queue, inactivity_timeout=1):
+                    if self._stopping.is_set():
+                        break
+                    if method is None:
+                        continue
+                    try:
+                        message = json.loads(body)
+                        job_id, project_id = message["job_id"], message["project_id"]
+                        tenant_id = message.get("tenant_id", "default")
+                    except Exception:
+                        # Redelivering a malformed message would only fail again; drop it
+                        # (dead-lettered if the queue has a dead-letter exchange)
+                        logger.exception(f"[IBA] Dropping malformed job message: {body[:200]!r}")
+                        channel.basic_nack(method.delivery_tag, requeue=False)
+                        continue
+
+                    def ack(tag=method.delivery_tag):
+                        connection.add_callback_threadsafe(lambda: channel.basic_ack(tag))
+
+                    def requeue(tag=method.delivery_tag):
+                        connection.add_callback_threadsafe(lambda: channel.basic_nack(tag, requeue=True))
+
+                    self._loop.call_soon_threadsafe(
+                        self._enqueue,
+                        job_id,
+                        project_id,
+                        tenant_id,
+                        properties.priority or 0,
+                        ack,
+                        requeue,
+                    )
+
+                channel.cancel()
+                connection.close()
+            except AMQPError as e:
+                logger.warning(f"[IBA] Job consumer connection lost: {e}; retrying in 5s")
+                time.sleep(5)
+            except Exception:
+                # Never let the thread die: the pool would silently stop taking jobs
+                logger.exception("[IBA] Job consumer failed; reconnecting in 5s")
+                time.sleep(5)
+
+@lru_cache()
+def get_job_pool() -> JobWorkerPool:
+    return JobWorkerPool(
+        backend=settings.iba_job_backend,
+        workers=settings.iba_job_workers,
+        tenant_concurrency=settings.iba_job_tenant_concurrency,
+    )
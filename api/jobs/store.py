@@ -0,0 +1,97 @@
+from api.config import get_settings
+from api.dal.mongo import get_async_db
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from typing import Dict, List, Optional
+import uuid
+
+settings = get_settings()
+
+# Job records live in Mongo so any API worker can answer status polls,
+# whichever process actually ran the job.
+#
+# A running job holds a lease that its worker renews while it runs. A job whose lease
+# has expired (its worker crashed) can be claimed again, and a job interrupted by a
+# clean shutdown is released back to "queued".
+
+CLAIMED = "claimed"    # this worker now runs the job
+BUSY = "busy"          # another worker holds a live lease; try again later
+FINISHED = "finished"  # completed, failed or gone; nothing to run
+
+def _jobs():
+    return get_async_db()[settings.iba_job_collection]
+
+async def create_job(project_id: str, tenant_id: str, priority: int) -> Dict:
+    job = {
+        "_id": uuid.uuid4().hex,
+        "project_id": project_id,
+        "tenant_id": tenant_id,
+        "priority": priority,
+        "status": "queued",
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "lease_expires_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+    }
+    await _jobs().insert_one(job)
+    return job
+
+async def claim_job(job_id: str, lease_seconds: float) -> str:
+    """Take a queued job, or a running one whose lease expired; returns CLAIMED, BUSY or FINISHED."""
+    now = datetime.utcnow()
+    result = await _jobs().update_one(
+        {"_id": job_id, "$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+        ]},
+        {
+            "$set": {"status": "running", "started_at": now, "lease_expires_at": now + timedelta(seconds=lease_seconds)},
+            "$inc": {"attempts": 1},
+        },
+    )
+    if result.modified_count == 1:
+        return CLAIMED
+    job = await _jobs().find_one({"_id": job_id}, {"status": 1})
+    return BUSY if job is not None and job["status"] == "running" else FINISHED
+
+async def renew_lease(job_id: str, lease_seconds: float):
+    await _jobs().update_one(
+        {"_id": job_id, "status": "running"},
+        {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+    )
+
+async def release_job(job_id: str):
+    """Hand a running job back to the queue (shutdown interrupted it)."""
+    await _jobs().update_one(
+        {"_id": job_id, "status": "running"},
+        {"$set": {"status": "queued", "started_at": None, "lease_expires_at": None}},
+    )
+
+async def unfinished_jobs() -> List[Dict]:
+    """Queued and running jobs, oldest first, for re-enqueueing at start-up."""
+    cursor = _jobs().find(
+        {"status": {"$in": ["queued", "running"]}},
+        {"project_id": 1, "tenant_id": 1, "priority": 1},
+    ).sort("created_at", 1)
+    return await cursor.to_list(length=None)
+
+async def mark_completed(job_id: str, result: Dict):
+    await _jobs().update_one(
+        {"_id": job_id},
+        {"$set": {"status": "completed", "finished_at": datetime.utcnow(), "result": jsonable_encoder(result)}},
+    )
+
+async def mark_failed(job_id: str, error: str):
+    await _jobs().update_one(
+        {"_id": job_id},
+        {"$set": {"status": "failed", "finished_at": datetime.utcnow(), "error": error}},
+    )
+
+async def get_job(job_id: str) -> Optional[Dict]:
+    job = await _jobs().find_one({"_id": job_id})
+    if job is None:
+        return None
+    job["job_id"] = job.pop("_id")
+    return job
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from api.jobs.pool import get_job_pool
+from api.jobs.store import get_job
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class SubmitIBAJobRequest(BaseModel):
+    project_id: str
+    tenant_id: str = "default"
+    priority: int = Field(default=0, ge=0, le=9)
+
+@router.post("/iba/jobs", status_code=202)
+async def submit_iba_job(request: SubmitIBAJobRequest):
+    try:
+        job = await get_job_pool().submit(request.project_id, request.tenant_id, request.priority)
+    except Exception as e:
+        logger.exception(f"[IBA] Could not queue job for project {request.project_id}")
+        raise HTTPException(status_code=500, detail=f"Could not queue IBA job: {str(e)}")
+
+    return {"job_id": job["_id"], "status": job["status"]}
+
+@router.get("/iba/jobs/{job_id}")
+async def get_iba_job(job_id: str):
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No IBA job found with id: {job_id}")
+    return job
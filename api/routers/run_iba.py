@@ -1,11 +1,28 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from api.iba.graph import build_iba_graph
+from api.config import get_settings
+from api.iba.graph import get_iba_graph
+from api.iba.runner import build_run_response, run_blueprint
 from api.iba.state import IBAState
+import asyncio
+import json
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# State fields streamed to clients as soon as the node that owns them completes
+STREAMED_SECTIONS = [
+    "architecture_guide",
+    "adrs",
+    "diagrams",
+    "tech_stack_guidance",
+    "system_diagram",
+    "blueprint_markdown",
+]
 
 class RunIBARequest(BaseModel):
     project_id: str
@@ -13,27 +30,77 @@ class RunIBARequest(BaseModel):
 @router.post("/iba/run")
 async def run_iba(request: RunIBARequest):
     try:
-        # Build the IBA graph
-        graph = build_iba_graph()
+        return await run_blueprint(request.project_id)
 
-        # Initial LangGraph state
-        initial_state = IBAState(project_id=request.project_id)
+    except Exception as e:
+        logger.exception(f"[IBA] Agent failed for project {request.project_id}")
+        raise HTTPException(status_code=500, detail=f"IBA agent execution failed: {str(e)}")
 
-        logger.info(f"[IBA] Running implementation blueprint agent for project {request.project_id}")
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
 
-        # Run the graph and rehydrate final state into IBAState
-        result = await graph.ainvoke(initial_state)
-        final_state = IBAState(**result)
+async def _stream_iba(project_id: str):
+    graph = get_iba_graph()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
 
-        return {
-            "project_id": final_state.project_id,
-            "paradigm": final_state.paradigm,
-            "blueprint_markdown": final_state.blueprint_markdown,
-            "diagrams": final_state.diagrams,
-            "adrs": final_state.adrs,
-            "file_info": final_state.exported_files,
-        }
+    async def produce():
+        # Runs independently of the client so keepalives can be sent while a node is busy
+        try:
+            final_values = None
+            sent_sections = {}
 
-    except Exception as e:
-        logger.exception(f"[IBA] Agent failed for project {request.project_id}")
-        raise HTTPException(status_code=500, detail=f"IBA agent execution failed: {str(e)}")
+            async def node_completed(node: str, update):
+                # Nodes returning the whole state repeat earlier sections; only send what changed
+                sections = {
+                    k: v for k, v in (update or {}).items()
+                    if k in STREAMED_SECTIONS and sent_sections.get(k) != v
+                }
+                sent_sections.update(sections)
+                trace = ((update or {}).get("trace") or {}).get(node)
+                await queue.put(_sse("iba.node.completed", {"node": node, "sections": sections, "trace": trace}))
+
+            async for mode, chunk in graph.astream(
+                IBAState(project_id=project_id), stream_mode=["updates", "custom", "values"]
+            ):
+                if mode == "values":
+                    final_values = chunk
+                elif mode == "custom" and chunk.get("event") == "node_completed":
+                    # A step inside a composite node (the guide chain)
+                    await node_completed(chunk["node"], chunk["update"])
+                elif mode == "custom":
+                    await queue.put(_sse("iba.section.partial", chunk))
+                else:
+                    for node, update in chunk.items():
+                        await node_completed(node, update)
+            await queue.put(_sse("iba.run.completed", build_run_response(IBAState(**final_values))))
+        except Exception as e:
+            logger.exception(f"[IBA] Streaming run failed for project {project_id}")
+            await queue.put(_sse("iba.run.failed", {"detail": f"IBA agent execution failed: {str(e)}"}))
+        finally:
+            await queue.put(done)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), settings.iba_stream_keepalive_seconds)
+            except asyncio.TimeoutError:
+                # SSE comment: keeps proxies/load balancers from timing out idle connections
+                yield ": keepalive\n\n"
+                continue
+            if message is done:
+                break
+            yield message
+    finally:
+        # Client disconnected (or run finished): don't keep a detached run going
+        producer.cancel()
+
+@router.post("/iba/run/stream")
+async def run_iba_stream(request: RunIBARequest):
+    logger.info(f"[IBA] Streaming implementation blueprint agent for project {request.project_id}")
+    return StreamingResponse(
+        _stream_iba(request.project_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
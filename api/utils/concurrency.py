@@ -0,0 +1,38 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar, Union
+
+T = TypeVar("T")
+
+class ChunkFailureError(RuntimeError):
+    """Some of a node's chunk calls failed, so its output would silently miss their part."""
+
+    def __init__(self, node: str, errors: Dict[int, BaseException], total: int):
+        self.node = node
+        self.errors = errors
+        first = next(iter(errors.values()))
+        super().__init__(
+            f"{node}: {len(errors)} of {total} chunk(s) failed "
+            f"(first: {str(first) or type(first).__name__})"
+        )
+
+async def gather_bounded(
+    factories: Sequence[Callable[[], Awaitable[T]]],
+    limit: int,
+    timeout: Optional[float] = None,
+) -> List[Union[T, BaseException]]:
+    """
+    Run coroutine factories concurrently with at most `limit` in flight.
+
+    Results are returned in the same order as `factories`. A call that raises or
+    exceeds `timeout` (seconds, measured once it gets a slot) yields its exception
+    in place of a result instead of cancelling the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _run(factory: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            if timeout:
+                return await asyncio.wait_for(factory(), timeout)
+            return await factory()
+
+    return await asyncio.gather(*(_run(f) for f in factories), return_exceptions=True)
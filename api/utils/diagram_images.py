@@ -0,0 +1,69 @@
+import base64
+import logging
+import os
+from typing import List, Optional
+from api.config import get_settings
+from api.utils.embed_system_diagrams import encode_plantuml
+from api.utils.executor import run_blocking
+from api.utils.plantuml_renderer import PlantUMLError, PlantUMLRenderer, get_plantuml_renderer
+
+logger = logging.getLogger(__name__)
+
+# Where diagram images come from (iba_diagram_render):
+#   remote: PLANTUML_SERVER_URL links, fetched by the PDF renderer while it builds the PDF
+#   inline: rendered locally up front and embedded as data URIs
+#   file:   rendered locally up front and written under output/diagrams
+# A diagram that fails or times out locally gets no image, so the blueprint falls
+# back to its PlantUML code block.
+DIAGRAM_RENDER_MODES = ("remote", "inline", "file")
+
+MIME_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+
+def plantuml_server_url(code: str) -> str:
+    return f"{get_settings().PLANTUML_SERVER_URL}/svg/{encode_plantuml(code)}"
+
+def _write_images(keys: List[str], images: List[Optional[bytes]], fmt: str) -> List[Optional[str]]:
+    output_dir = os.path.join(os.getcwd(), "output", "diagrams")
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for key, data in zip(keys, images):
+        if data is None:
+            paths.append(None)
+            continue
+        path = os.path.join(output_dir, f"{key[:24]}.{fmt}")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        paths.append(path)
+    return paths
+
+async def diagram_image_urls(codes: List[str]) -> List[Optional[str]]:
+    """Image URL (or local path / data URI) per diagram code; None means use the code block."""
+    settings = get_settings()
+    mode = settings.iba_diagram_render
+    if mode not in DIAGRAM_RENDER_MODES:
+        raise ValueError(f"Unknown diagram render mode: {mode}")
+    if mode == "remote" or not codes:
+        return [plantuml_server_url(code) for code in codes]
+
+    fmt = settings.iba_diagram_image_format
+    try:
+        results = await get_plantuml_renderer().arender_many(codes, fmt)
+    except PlantUMLError as e:
+        logger.warning(f"[IBA] Local diagram rendering unavailable, using code blocks: {e}")
+        return [None] * len(codes)
+
+    for result in results:
+        if not result.ok:
+            logger.warning(f"[IBA] Diagram render failed, using code block: {result.error}")
+    images = [result.data for result in results]
+
+    if mode == "file":
+        keys = [PlantUMLRenderer.cache_key(code, fmt) for code in codes]
+        return await run_blocking(_write_images, keys, images, fmt)
+
+    mime = MIME_TYPES[fmt]
+    return [
+        f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}" if data is not None else None
+        for data in images
+    ]
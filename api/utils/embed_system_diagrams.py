@@ -1,29 +1,44 @@
 import zlib
 import base64
+import hashlib
+import threading
+from collections import OrderedDict
 
 # PlantUML base64 alphabet
 PLANTUML_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_"
 
+STANDARD_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+# Maps standard base64 output onto PlantUML's alphabet in one pass
+_TRANSLATION = bytes.maketrans(STANDARD_ALPHABET.encode("ascii"), PLANTUML_ALPHABET.encode("ascii"))
+
+# Diagram codes repeat across runs; cache encodings by code hash (bounded, LRU)
+ENCODE_CACHE_SIZE = 1024
+_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
 def encode_plantuml(plantuml_text: str) -> str:
     """Encode PlantUML text to PlantUML server-compatible base64."""
     data = plantuml_text.encode("utf-8")
+    key = hashlib.sha256(data).digest()
+    with _cache_lock:
+        encoded = _cache.get(key)
+        if encoded is not None:
+            _cache.move_to_end(key)
+            return encoded
+
     compressed = zlib.compress(data)[2:-4]  # strip zlib header and checksum
-    return _encode_base64(compressed)
+    encoded = _encode_base64(compressed)
+
+    with _cache_lock:
+        _cache[key] = encoded
+        if len(_cache) > ENCODE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return encoded
 
 def _encode_base64(data: bytes) -> str:
-    """Custom base64 encoder using PlantUML's alphabet."""
-    res = ""
-    buffer = 0
-    buffer_len = 0
-
-    for byte in data:
-        buffer = (buffer << 8) | byte
-        buffer_len += 8
-        while buffer_len >= 6:
-            buffer_len -= 6
-            res += PLANTUML_ALPHABET[(buffer >> buffer_len) & 0x3F]
-
-    if buffer_len > 0:
-        res += PLANTUML_ALPHABET[(buffer << (6 - buffer_len)) & 0x3F]
-
-    return res
+    """
+    Base64 with PlantUML's alphabet and no padding. Standard base64 zero-fills the
+    last sextet just like PlantUML's encoder, so only the alphabet differs.
+    """
+    return base64.b64encode(data).rstrip(b"=").translate(_TRANSLATION).decode("ascii")
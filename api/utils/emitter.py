@@ -1,12 +1,201 @@
 # 📁 api/utils/lia_event_emitter.py
 
+import asyncio
+import json
+import logging
+import os
+import threading
 from datetime import datetime
-from typing import Optional, Dict
-from api.utils.rabbitmq import publish_event
+from functools import lru_cache
+from typing import List, Optional, Dict, Tuple
+from api.utils.rabbitmq import get_publisher, publish_event
 from api.config import get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
+OVERFLOW_POLICIES = ("drop_oldest", "block", "spill")
+
+Message = Tuple[str, Dict]  # (routing_key, payload)
+
+class AsyncEventEmitter:
+    """
+    Bounded in-memory event queue drained by a background sender task.
+
+    Producers never wait on the broker: publishing happens in a worker thread from
+    the sender task. When the queue is full the overflow policy decides what happens:
+      - drop_oldest: discard the oldest queued event
+      - block: producers on other threads wait for space; producers on the loop
+        thread cannot, so the event goes to a pending put, and once `maxsize` puts
+        are pending further events are dropped (counted in `dropped`)
+      - spill: append the event to a JSONL file, replayed once the queue drains
+    """
+
+    def __init__(self, maxsize: int = 1000, overflow: str = "drop_oldest",
+                 spill_path: Optional[str] = None, batch_size: int = 50):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown event overflow policy: {overflow}")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.batch_size = max(1, batch_size)
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending_puts: set = set()
+        self._spill_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run(), name="iba-event-sender")
+
+    def submit(self, message: Message):
+        """Enqueue from any thread without blocking the event loop."""
+        if threading.get_ident() == self._loop_thread:
+            self._put_nowait(message)
+        elif self.overflow == "block":
+            asyncio.run_coroutine_threadsafe(self._queue.put(message), self._loop).result()
+        else:
+            self._loop.call_soon_threadsafe(self._put_nowait, message)
+
+    def _put_nowait(self, message: Message):
+        try:
+            self._queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow == "drop_oldest":
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self._queue.put_nowait(message)
+            self.dropped += 1
+        elif self.overflow == "spill" and self.spill_path:
+            self._spill([message])
+        elif self.overflow == "block" and len(self._pending_puts) < self.maxsize:
+            task = asyncio.create_task(self._queue.put(message))
+            self._pending_puts.add(task)
+            task.add_done_callback(self._pending_puts.discard)
+        else:
+            # A stalled consumer must not grow memory without bound
+            if self.dropped % 100 == 0:
+                logger.warning(f"[IBA] Event queue full; dropping events ({self.dropped + 1} so far)")
+            self.dropped += 1
+
+    def _spill(self, messages: List[Message]):
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for routing_key, payload in messages:
+                    f.write(json.dumps({"routing_key": routing_key, "payload": payload}) + "\n")
+
+    def _take_spilled(self) -> List[Message]:
+        with self._spill_lock:
+            if not self.spill_path or not os.path.exists(self.spill_path):
+                return []
+            with open(self.spill_path, encoding="utf-8") as f:
+                lines = f.readlines()
+            os.remove(self.spill_path)
+
+        messages = []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                messages.append((record["routing_key"], record["payload"]))
+            except (ValueError, KeyError, TypeError) as e:
+                # e.g. a line cut short by a crash mid-write; one bad line must not lose the rest
+                logger.warning(f"[IBA] Skipping unreadable spilled event on line {number}: {e}")
+        return messages
+
+    def _send(self, batch: List[Message]):
+        try:
+            get_publisher().publish_batch(batch)
+        except Exception as e:
+            logger.warning(f"[RabbitMQ] Failed to publish {len(batch)} event(s): {e}")
+            if self.overflow == "spill" and self.spill_path:
+                self._spill(batch)
+
+    def _replay_spilled(self):
+        try:
+            spilled = self._take_spilled()
+        except OSError:
+            logger.exception("[IBA] Could not read spilled events")
+            return
+        if spilled:
+            self._send(spilled)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await asyncio.to_thread(self._send, batch)
+                if self.overflow == "spill" and self._queue.empty():
+                    await asyncio.to_thread(self._replay_spilled)
+            except Exception:
+                # The sender must outlive any one batch, or every later event is lost
+                logger.exception(f"[IBA] Event sender failed on a batch of {len(batch)}")
+
+            # Only mark done after any replay so stop() also waits for spilled events
+            for _ in batch:
+                self._queue.task_done()
+
+    async def stop(self, timeout: float = 5.0):
+        """Flush queued events (bounded by `timeout`) and stop the sender."""
+        if not self.running:
+            return
+        try:
+            if self._pending_puts:
+                await asyncio.wait(self._pending_puts, timeout=timeout)
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[RabbitMQ] Event flush timed out with {self._queue.qsize()} event(s) queued")
+            if self.overflow == "spill" and self.spill_path:
+                leftover = []
+                while not self._queue.empty():
+                    leftover.append(self._queue.get_nowait())
+                self._spill(leftover)
+        finally:
+            self._task.cancel()
+            self._task = None
+
+@lru_cache()
+def get_event_emitter() -> AsyncEventEmitter:
+    return AsyncEventEmitter(
+        maxsize=settings.iba_event_queue_size,
+        overflow=settings.iba_event_overflow,
+        spill_path=settings.iba_event_spill_path,
+        batch_size=settings.rabbitmq_confirm_batch_size,
+    )
+
+def _build_payload(project_id: str, node: str, event_type: str, status: str, metadata: Optional[Dict]) -> Dict:
+    event_payload = {
+        "event": event_type,
+        "project_id": project_id,
+        "node": node,
+        "status": status,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+    if metadata:
+        event_payload["metadata"] = metadata
+
+    return event_payload
+
 def emit_iba_event(
     project_id: str,
     node: str,
@@ -17,6 +206,9 @@ def emit_iba_event(
     """
     Unified LIA event emitter.
 
+    Events are queued on the background emitter when it is running (inside the app);
+    otherwise (CLI, scripts) they are published directly.
+
     Args:
         project_id (str): ID of the project.
         node (str): Name of the current IBA graph node.
@@ -24,18 +216,11 @@ def emit_iba_event(
         status (str): Status e.g., "started", "completed", "error"
         metadata (Optional[Dict]): Additional info (e.g., error message, model name).
     """
-    event_payload = {
-        "event": event_type,
-        "project_id": project_id,
-        "node": node,
-        "status": status,
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    event_payload = _build_payload(project_id, node, event_type, status, metadata)
+    routing_key = settings.rabbitmq_routing_key_iba_stream
 
-    if metadata:
-        event_payload["metadata"] = metadata
-
-    publish_event(
-        event_payload,
-        routing_key=settings.rabbitmq_routing_key_iba_stream
-    )
+    emitter = get_event_emitter()
+    if emitter.running:
+        emitter.submit((routing_key, event_payload))
+    else:
+        publish_event(event_payload, routing_key=routing_key)
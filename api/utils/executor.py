@@ -0,0 +1,26 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable
+from api.config import get_settings
+
+# Bounded thread pool for the blocking work graph nodes cannot avoid (file I/O, PDF
+# conversion, CPU-heavy rendering). Nodes stay async and await it, so the event loop
+# keeps serving other runs and the number of blocking workers has a hard cap.
+
+@lru_cache()
+def get_blocking_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=get_settings().iba_blocking_workers, thread_name_prefix="iba-blocking")
+
+async def run_blocking(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run `fn` on the bounded executor, carrying context variables (e.g. the node trace)."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        get_blocking_executor(), partial(context.run, fn, *args, **kwargs)
+    )
+
+def shutdown_blocking_executor():
+    if get_blocking_executor.cache_info().currsize:
+        get_blocking_executor().shutdown(wait=True)
+        get_blocking_executor.cache_clear()
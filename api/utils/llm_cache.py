@@ -0,0 +1,263 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+from langchain_core.messages import AIMessage, BaseMessage
+from prometheus_client import Counter
+from api.config import get_settings
+from api.utils.executor import run_blocking
+from api.utils.llm_gateway import get_llm_gateway
+from api.utils.llm_usage import LLMUsage, extract_usage
+from api.utils.tracing import record_llm_tokens, span
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed cache in front of every IBA LLM call.
+# Key = sha256(model, temperature, rendered prompt messages); value = response text.
+# Callers pass `validate` (e.g. the output parser) so only usable responses are stored.
+
+CACHE_LOOKUPS = Counter(
+    "iba_llm_cache_lookups_total", "LLM response cache lookups (rejected: a hit that failed validation)", ["backend", "result"]
+)
+CACHE_ERRORS = Counter(
+    "iba_llm_cache_errors_total", "LLM response cache backend failures", ["backend", "operation"]
+)
+
+class MemoryLRUBackend:
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if self.ttl_seconds and time.time() - created > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SQLiteBackend:
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, accessed, created) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Evict least recently used rows beyond the size limit
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+class MongoBackend:
+    """Mongo collection backend; expiry is handled by a TTL index on created_at."""
+
+    def __init__(self, collection_name: str, ttl_seconds: int):
+        from api.dal.mongo import get_db
+
+        self.ttl_seconds = ttl_seconds
+        self._collection = get_db()[collection_name]
+        if ttl_seconds:
+            self._collection.create_index("created_at", expireAfterSeconds=ttl_seconds, name="iba_llm_cache_ttl")
+
+    def get(self, key: str) -> Optional[str]:
+        doc = self._collection.find_one({"_id": key}, {"value": 1, "created_at": 1})
+        if doc is None:
+            return None
+        # The TTL monitor only runs once a minute, so double-check expiry here
+        if self.ttl_seconds and doc["created_at"] < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+            return None
+        return doc["value"]
+
+    def set(self, key: str, value: str):
+        self._collection.replace_one(
+            {"_id": key}, {"_id": key, "value": value, "created_at": datetime.utcnow()}, upsert=True
+        )
+
+class LLMCache:
+    def __init__(self, backend, name: str):
+        self.backend = backend
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            CACHE_ERRORS.labels(self.name, "read").inc()
+            logger.warning(f"[IBA] LLM cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+            CACHE_LOOKUPS.labels(self.name, "miss").inc()
+        else:
+            self.hits += 1
+            CACHE_LOOKUPS.labels(self.name, "hit").inc()
+        return value
+
+    def reject(self):
+        """A hit whose value failed validation (stored before validation existed); counted as a miss."""
+        self.hits -= 1
+        self.misses += 1
+        CACHE_LOOKUPS.labels(self.name, "rejected").inc()
+
+    def set(self, key: str, value: str):
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            self.errors += 1
+            CACHE_ERRORS.labels(self.name, "write").inc()
+            logger.warning(f"[IBA] LLM cache write failed: {e}")
+
+    async def aget(self, key: str) -> Optional[str]:
+        if isinstance(self.backend, MemoryLRUBackend):
+            return self.get(key)
+        return await run_blocking(self.get, key)
+
+    async def aset(self, key: str, value: str):
+        if isinstance(self.backend, MemoryLRUBackend):
+            return self.set(key, value)
+        await run_blocking(self.set, key, value)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+@lru_cache()
+def get_llm_cache() -> Optional[LLMCache]:
+    settings = get_settings()
+    backend = settings.llm_cache_backend
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return LLMCache(MemoryLRUBackend(settings.llm_cache_max_entries, settings.llm_cache_ttl_seconds), backend)
+    if backend == "sqlite":
+        return LLMCache(
+            SQLiteBackend(settings.llm_cache_sqlite_path, settings.llm_cache_max_entries, settings.llm_cache_ttl_seconds),
+            backend,
+        )
+    if backend == "mongo":
+        return LLMCache(MongoBackend(settings.llm_cache_mongo_collection, settings.llm_cache_ttl_seconds), backend)
+    raise ValueError(f"Unknown llm_cache_backend: {backend}")
+
+async def aget_llm_cache() -> Optional[LLMCache]:
+    """get_llm_cache for the event loop: the first call connects the backend (SQLite DDL, Mongo indexes) off the loop."""
+    if get_llm_cache.cache_info().currsize:
+        return get_llm_cache()
+    return await run_blocking(get_llm_cache)
+
+def _model_name(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+def _content_bytes(messages: List[BaseMessage]) -> int:
+    return sum(len(str(m.content).encode("utf-8")) for m in messages)
+
+def _record_call(llm, call_span, messages: List[BaseMessage], response: BaseMessage, usage: Optional[LLMUsage]):
+    call_span.add_bytes(_content_bytes(messages) + _content_bytes([response]))
+    record_llm_tokens(_model_name(llm), extract_usage(response))
+    if usage is not None:
+        usage.record(response)
+
+def cache_key(llm, messages: List[BaseMessage]) -> str:
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    payload = {
+        "model": model,
+        "temperature": getattr(llm, "temperature", None),
+        "messages": [{"type": m.type, "content": m.content} for m in messages],
+    }
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _valid(content: str, validate: Optional[Callable[[str], Any]]) -> bool:
+    if validate is None:
+        return True
+    try:
+        validate(content)
+    except Exception:
+        return False
+    return True
+
+async def cached_ainvoke(
+    llm,
+    messages: List[BaseMessage],
+    usage: Optional[LLMUsage] = None,
+    validate: Optional[Callable[[str], Any]] = None,
+) -> AIMessage:
+    """
+    Invoke through the response cache. `validate` gets the response text and raises if it
+    is unusable; such responses are returned but never cached, so a retry calls the LLM again.
+    """
+    cache = await aget_llm_cache()
+    key = cache_key(llm, messages) if cache is not None else None
+    if cache is not None:
+        content = await cache.aget(key)
+        if content is not None and _valid(content, validate):
+            if usage is not None:
+                usage.record_cache_hit()
+            return AIMessage(content=content)
+        if content is not None:
+            cache.reject()
+
+    with span("llm", _model_name(llm)) as call_span:
+        response = await get_llm_gateway().ainvoke(llm, messages)
+        _record_call(llm, call_span, messages, response, usage)
+    if cache is not None and _valid(response.content, validate):
+        await cache.aset(key, response.content)
+    return response
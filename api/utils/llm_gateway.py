@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+from prometheus_client import Counter, Histogram
+from api.config import get_settings
+from api.utils.llm_usage import extract_usage
+from api.utils.tracing import record_retry
+
+logger = logging.getLogger(__name__)
+
+# Process-wide LLM gateway. Every IBA LLM call goes through it, so concurrent nodes and
+# concurrent runs share one connection pool, one requests/tokens-per-minute budget and
+# one view of the provider's rate limiting (a 429 slows every caller, not just one).
+
+RATE_LIMITED = Counter("iba_llm_rate_limited_total", "LLM calls rejected with 429", ["model"])
+BUDGET_WAIT = Histogram(
+    "iba_llm_budget_wait_seconds", "Time LLM calls waited for the RPM/TPM budget",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+class RateBudget:
+    """
+    Requests- and tokens-per-minute token buckets shared by all callers in the process.
+
+    Callers reserve a request plus an estimated token count up front and wait for the
+    returned delay; estimates are settled against real usage afterwards. On a 429 the
+    effective rate is cut multiplicatively and every caller pauses; each success
+    raises it again additively.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.scale = 1.0
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            rate = self.requests_per_minute * self.scale
+            self._requests = min(rate, self._requests + elapsed * rate / 60)
+        if self.tokens_per_minute:
+            rate = self.tokens_per_minute * self.scale
+            self._tokens = min(rate, self._tokens + elapsed * rate / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """Take one request and `tokens` tokens from the budget; returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            waits = [self._paused_until - now]
+            if self.requests_per_minute:
+                self._requests -= 1
+                waits.append(-self._requests / (self.requests_per_minute * self.scale / 60))
+            if self.tokens_per_minute:
+                self._tokens -= tokens
+                waits.append(-self._tokens / (self.tokens_per_minute * self.scale / 60))
+            return max(0.0, *waits)
+
+    def pause_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def settle(self, estimated: int, actual: int):
+        with self._lock:
+            self._tokens += estimated - actual
+
+    def throttle(self, pause: float):
+        with self._lock:
+            self.scale = max(0.1, self.scale * 0.7)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def recover(self):
+        with self._lock:
+            self.scale = min(1.0, self.scale + 0.05)
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+def _is_rate_limit(error: Exception) -> bool:
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectError", "ReadTimeout")
+
+def _retry_after(error: Exception) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _model_name(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+class LLMGateway:
+    def __init__(self, budget: RateBudget, max_retries: int, backoff_base: float, backoff_max: float,
+                 completion_estimate: int, attempt_timeout: Optional[float] = None):
+        self.budget = budget
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.completion_estimate = completion_estimate
+
+    def _estimate(self, messages: List[BaseMessage]) -> int:
+        # Cheap ~4 chars/token estimate; settled against the reported usage afterwards
+        return sum(len(str(m.content)) for m in messages) // 4 + self.completion_estimate
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        # Full jitter, but never retry before the provider's Retry-After
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, _retry_after(error))
+
+    def _settle(self, estimate: int, response) -> None:
+        usage = extract_usage(response)
+        actual = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.budget.settle(estimate, actual or estimate)
+        self.budget.recover()
+
+    def _failed(self, model: str, attempt: int, estimate: int, error: Exception) -> float:
+        """Returns the backoff before the next attempt, or re-raises when giving up."""
+        if not _is_retryable(error) or attempt >= self.max_retries:
+            raise error
+        # A rejected request used no tokens
+        self.budget.settle(estimate, 0)
+        delay = self._backoff(attempt, error)
+        if _is_rate_limit(error):
+            RATE_LIMITED.labels(model).inc()
+            self.budget.throttle(delay)
+        record_retry("llm", model)
+        logger.warning(f"[IBA] LLM call to {model} failed ({type(error).__name__}); retry {attempt + 1} in {delay:.1f}s")
+        return delay
+
+    async def ainvoke(self, llm, messages: List[BaseMessage]):
+        model = _model_name(llm)
+        estimate = self._estimate(messages)
+        attempt = 0
+        while True:
+            wait = self.budget.reserve(estimate)
+            while wait > 0:
+                BUDGET_WAIT.observe(wait)
+                await asyncio.sleep(wait)
+                wait = self.budget.pause_remaining()
+            try:
+                # Each attempt has its own deadline; a timed-out attempt is retried like a 5xx
+                response = await asyncio.wait_for(llm.ainvoke(messages), self.attempt_timeout)
+            except Exception as e:
+                await asyncio.sleep(self._failed(model, attempt, estimate, e))
+                attempt += 1
+                continue
+            self._settle(estimate, response)
+            return response
+
+@lru_cache()
+def get_llm_gateway() -> LLMGateway:
+    settings = get_settings()
+    return LLMGateway(
+        RateBudget(settings.llm_requests_per_minute, settings.llm_tokens_per_minute),
+        max_retries=settings.llm_max_retries,
+        backoff_base=settings.llm_backoff_base_seconds,
+        backoff_max=settings.llm_backoff_max_seconds,
+        completion_estimate=settings.llm_completion_token_estimate,
+        attempt_timeout=settings.llm_request_timeout,
+    )
+
+@lru_cache()
+def get_openai_clients() -> Tuple:
+    """Shared OpenAI sync/async clients over pooled keep-alive HTTP connections."""
+    import httpx
+    import openai
+
+    settings = get_settings()
+    limits = httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_connections,
+    )
+    options = {
+        "api_key": settings.openai_api_key,
+        "timeout": settings.llm_request_timeout,
+        # Retries are coordinated by the gateway, not per client
+        "max_retries": 0,
+    }
+    return (
+        openai.OpenAI(http_client=httpx.Client(limits=limits, timeout=settings.llm_request_timeout), **options),
+        openai.AsyncOpenAI(http_client=httpx.AsyncClient(limits=limits, timeout=settings.llm_request_timeout), **options),
+    )
+
+async def close_openai_clients():
+    if get_openai_clients.cache_info().currsize:
+        sync_client, async_client = get_openai_clients()
+        sync_client.close()
+        await async_client.close()
+        get_openai_clients.cache_clear()
@@ -0,0 +1,55 @@
+from typing import Dict, Optional
+from langchain_core.messages import BaseMessage
+
+# Per-node LLM usage, including prompt tokens the provider served from its prefix cache.
+
+def extract_usage(message: BaseMessage) -> Dict[str, int]:
+    """Normalize token usage from a chat response (community or langchain-openai shapes)."""
+    usage_metadata = getattr(message, "usage_metadata", None)
+    if usage_metadata:
+        details = usage_metadata.get("input_token_details") or {}
+        return {
+            "prompt_tokens": usage_metadata.get("input_tokens", 0),
+            "completion_tokens": usage_metadata.get("output_tokens", 0),
+            "cached_tokens": details.get("cache_read", 0) or 0,
+        }
+
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return {
+        "prompt_tokens": token_usage.get("prompt_tokens", 0) or 0,
+        "completion_tokens": token_usage.get("completion_tokens", 0) or 0,
+        "cached_tokens": details.get("cached_tokens", 0) or 0,
+    }
+
+class LLMUsage:
+    def __init__(self):
+        self.calls = 0
+        self.response_cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, message: BaseMessage):
+        usage = extract_usage(message)
+        self.calls += 1
+        self.prompt_tokens += usage["prompt_tokens"]
+        self.completion_tokens += usage["completion_tokens"]
+        self.cached_tokens += usage["cached_tokens"]
+
+    def record_cache_hit(self):
+        self.response_cache_hits += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "response_cache_hits": self.response_cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_tokens,
+            "prefix_cache_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+        }
+
+def merge_node_usage(left: Optional[Dict[str, Dict]], right: Optional[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """State reducer: each node writes its own key, so parallel branches never collide."""
+    return {**(left or {}), **(right or {})}
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Optional
+from prometheus_client import Counter, Histogram
+from api.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Event-loop lag monitor: a task that sleeps for a fixed interval and measures how late
+# it wakes up. Any lag beyond the threshold means something ran on the loop without
+# yielding (blocking I/O, a sync LLM call, heavy CPU work) and stalled every other run.
+
+LOOP_LAG = Histogram(
+    "iba_event_loop_lag_seconds", "How late the event loop woke a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_BLOCKED = Counter("iba_event_loop_blocked_total", "Event loop stalls longer than the lag threshold")
+
+class LoopLagMonitor:
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.blocked = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocked += 1
+                LOOP_BLOCKED.inc()
+                logger.warning(f"[IBA] Event loop blocked for {lag * 1000:.0f} ms")
+
+    def reset(self) -> dict:
+        """Return lag stats since the last reset and start a new window."""
+        stats = {"max_lag_ms": round(self.max_lag * 1000, 2), "blocked": self.blocked}
+        self.max_lag = 0.0
+        self.blocked = 0
+        return stats
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+@lru_cache()
+def get_loop_monitor() -> LoopLagMonitor:
+    settings = get_settings()
+    return LoopLagMonitor(settings.iba_loop_lag_interval_seconds, settings.iba_loop_lag_threshold_seconds)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional, Set
+from api.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Blueprint PDF export. Markdown → HTML → PDF is CPU-bound, so both conversions run
+# in-process with WeasyPrint inside a small process pool instead of a wkhtmltopdf
+# subprocess per report on the request path. Each worker parses the stylesheet once
+# at start-up and reuses it for every document.
+#
+# Modes (iba_pdf_mode): sync waits for the PDF inside render_output, deferred returns
+# once the markdown is written and finishes the PDF in the background, off skips it.
+
+BLUEPRINT_CSS = """
+body {
+    font-family: 'Segoe UI', 'Helvetica Neue', Helvetica, Arial, sans-serif;
+    font-size: 12pt;
+    line-height: 1.6;
+    color: #1a1a1a;
+    padding: 2em;
+}
+h1, h2, h3, h4 {
+    font-weight: bold;
+    color: #0b0c0c;
+}
+code, pre {
+    font-family: 'Courier New', monospace;
+    background-color: #f4f4f4;
+    padding: 0.3em;
+    border-radius: 4px;
+}
+pre {
+    white-space: pre-wrap;
+}
+ul, ol {
+    margin-left: 1.2em;
+}
+img {
+    max-width: 100%;
+}
+"""
+
+# Per worker process, set by _init_worker
+_stylesheet = None
+_font_config = None
+
+def _init_worker(css: str):
+    global _stylesheet, _font_config
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    _font_config = FontConfiguration()
+    _stylesheet = CSS(string=css, font_config=_font_config)
+
+def _render_pdf(markdown: str, pdf_path: str, base_url: str) -> int:
+    """Runs in a pool worker: markdown → HTML → PDF at pdf_path; returns the PDF size."""
+    import markdown2
+    from weasyprint import HTML
+
+    html_content = markdown2.markdown(markdown, extras=["fenced-code-blocks"])
+    html = f"<html><head><meta charset=\"utf-8\"></head><body>{html_content}</body></html>"
+
+    # Write aside and rename so a deferred PDF never appears half-written
+    partial_path = pdf_path + ".partial"
+    try:
+        HTML(string=html, base_url=base_url).write_pdf(
+            partial_path, stylesheets=[_stylesheet], font_config=_font_config
+        )
+        os.replace(partial_path, pdf_path)
+    finally:
+        # Gone after a successful rename; left behind only when rendering failed
+        try:
+            os.unlink(partial_path)
+        except FileNotFoundError:
+            pass
+    return os.path.getsize(pdf_path)
+
+@lru_cache()
+def get_pdf_pool() -> ProcessPoolExecutor:
+    # spawn: forking a process that runs an event loop and thread pools is unsafe
+    return ProcessPoolExecutor(
+        max_workers=get_settings().iba_pdf_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(BLUEPRINT_CSS,),
+    )
+
+async def render_pdf(markdown: str, pdf_path: str, base_url: Optional[str] = None) -> int:
+    """Convert blueprint markdown to a PDF in the pool; returns the PDF size in bytes."""
+    loop = asyncio.get_running_loop()
+    base_url = base_url or os.path.dirname(os.path.abspath(pdf_path))
+    pool = get_pdf_pool()
+    try:
+        return await loop.run_in_executor(pool, _render_pdf, markdown, pdf_path, base_url)
+    except BrokenProcessPool:
+        # A crashed worker breaks the whole pool; start a fresh one for the next report
+        if get_pdf_pool.cache_info().currsize and get_pdf_pool() is pool:
+            get_pdf_pool.cache_clear()
+        pool.shutdown(wait=False)
+        raise
+
+# Deferred PDFs still being rendered (kept referenced until done)
+_pending: Set[asyncio.Task] = set()
+
+def defer(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return task
+
+async def close_pdf_renderer(timeout: float = 30.0):
+    """Let deferred PDFs finish (bounded by `timeout`), then stop the pool."""
+    if _pending:
+        _, unfinished = await asyncio.wait(set(_pending), timeout=timeout)
+        if unfinished:
+            logger.warning(f"[IBA] Abandoning {len(unfinished)} deferred PDF(s) at shutdown")
+            for task in unfinished:
+                task.cancel()
+    if get_pdf_pool.cache_info().currsize:
+        get_pdf_pool().shutdown(wait=False, cancel_futures=True)
+        get_pdf_pool.cache_clear()
@@ -1,28 +1,259 @@
-import subprocess
+import hashlib
 import os
+import select
+import shutil
+import subprocess
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+from api.config import get_settings
+from api.utils.executor import run_blocking
+from api.utils.tracing import span
+
+# Local PlantUML rendering. A few long-lived `java -jar plantuml.jar -pipe` workers are
+# kept warm (no JVM start per diagram); diagrams are streamed to them in batches over
+# stdin and images are read back from stdout, split on a delimiter line, so nothing
+# touches the filesystem. Rendered images are cached by content hash.
+#
+# PlantUML reports syntax errors as an error image, which is returned like any other.
 
-PLANTUML_JAR_PATH = os.path.abspath("tools/plantuml-1.2025.3")  # Adjust if needed
 OUTPUT_DIR = os.path.abspath("output/diagrams")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+FORMATS = ("svg", "png")
 
-def render_plantuml_to_png(code: str, name_hint: str) -> str:
-    temp_id = str(uuid.uuid4())
-    filename = f"{name_hint}_{temp_id}.puml"
-    puml_path = os.path.join(OUTPUT_DIR, filename)
-
-    with open(puml_path, "w", encoding="utf-8") as f:
-        f.write(code)
-
-    try:
-        subprocess.run(
-            ["java", "-jar", PLANTUML_JAR_PATH, "-tpng", puml_path],
-            check=True,
-            cwd=OUTPUT_DIR
+class PlantUMLError(RuntimeError):
+    pass
+
+class PlantUMLUnavailable(PlantUMLError):
+    """Java or the PlantUML jar is missing."""
+
+@dataclass
+class RenderResult:
+    data: Optional[bytes] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.data is not None
+
+def _wrap(code: str) -> str:
+    code = code.strip()
+    if not code.startswith("@start"):
+        code = f"@startuml\n{code}\n@enduml"
+    return code + "\n"
+
+class PlantUMLWorker:
+    """One warm `-pipe` process; renders one batch at a time."""
+
+    def __init__(self, java: str, jar: str, fmt: str):
+        self.java = java
+        self.jar = jar
+        self.fmt = fmt
+        self.delimiter = f"__IBA_PLANTUML_{uuid.uuid4().hex}__".encode("ascii")
+        self._process: Optional[subprocess.Popen] = None
+        self._buffer = b""
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._process is not None and self._process.poll() is None:
+            return
+        self._process = subprocess.Popen(
+            [
+                self.java, "-Djava.awt.headless=true", "-jar", self.jar,
+                "-pipe", f"-t{self.fmt}", "-charset", "UTF-8",
+                "-pipedelimitor", self.delimiter.decode("ascii"),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
         )
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"PlantUML failed: {e}")
+        self._buffer = b""
+
+    def stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _write(self, process: subprocess.Popen, codes: List[str]):
+        # Separate thread: a large batch can fill the stdout pipe before stdin is drained
+        try:
+            for code in codes:
+                process.stdin.write(_wrap(code).encode("utf-8"))
+            process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+    def _read_one(self, process: subprocess.Popen, timeout: float) -> bytes:
+        deadline = time.monotonic() + timeout
+        fd = process.stdout.fileno()
+        while True:
+            index = self._buffer.find(self.delimiter)
+            if index >= 0:
+                image = self._buffer[:index]
+                self._buffer = self._buffer[index + len(self.delimiter):].lstrip(b"\r\n")
+                return image.rstrip(b"\r\n") if self.fmt == "svg" else image
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"PlantUML did not render within {timeout:.0f}s")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise PlantUMLError("PlantUML worker exited")
+            self._buffer += chunk
+
+    def render_batch(self, codes: List[str], timeout: float) -> List[RenderResult]:
+        """Render `codes` in order; a diagram that times out fails alone and the worker restarts."""
+        with self._lock:
+            results: List[RenderResult] = []
+            pending = list(codes)
+            while pending:
+                self.start()
+                process = self._process
+                threading.Thread(target=self._write, args=(process, pending), daemon=True).start()
+                done = 0
+                for _ in pending:
+                    done += 1
+                    try:
+                        results.append(RenderResult(data=self._read_one(process, timeout)))
+                    except (TimeoutError, PlantUMLError) as e:
+                        results.append(RenderResult(error=str(e)))
+                        # The stream is out of sync now; restart and resend the rest
+                        self.stop()
+                        break
+                pending = pending[done:]
+            return results
+
+class PlantUMLRenderer:
+    def __init__(self, java: str, jar: str, workers: int, timeout: float, cache_size: int):
+        self.java = java
+        self.jar = jar
+        self.workers = workers
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._workers: Dict[str, List[PlantUMLWorker]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plantuml")
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
 
-    # PlantUML outputs a .png with the same basename
-    png_path = os.path.splitext(puml_path)[0] + ".png"
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.java) is not None and os.path.isfile(self.jar)
+
+    def _workers_for(self, fmt: str) -> List[PlantUMLWorker]:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported PlantUML format: {fmt}")
+        if not self.available:
+            raise PlantUMLUnavailable(f"PlantUML needs '{self.java}' and {self.jar}")
+        with self._lock:
+            if fmt not in self._workers:
+                self._workers[fmt] = [PlantUMLWorker(self.java, self.jar, fmt) for _ in range(self.workers)]
+            return self._workers[fmt]
+
+    def warm(self, fmt: str = "svg"):
+        for worker in self._workers_for(fmt):
+            worker.start()
+
+    @staticmethod
+    def cache_key(code: str, fmt: str) -> str:
+        return hashlib.sha256(f"{fmt}\0{code.strip()}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+            return data
+
+    def _store(self, key: str, data: bytes):
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def render_many(self, codes: List[str], fmt: str = "svg") -> List[RenderResult]:
+        """Render diagrams (cache first), spreading misses over the warm workers in batches."""
+        keys = [self.cache_key(code, fmt) for code in codes]
+        results: Dict[str, RenderResult] = {}
+        misses: Dict[str, str] = {}
+        for key, code in zip(keys, codes):
+            data = self._cached(key)
+            if data is not None:
+                results[key] = RenderResult(data=data)
+            else:
+                misses.setdefault(key, code)
+
+        if misses:
+            workers = self._workers_for(fmt)
+            items = list(misses.items())
+            batches = [items[i::len(workers)] for i in range(len(workers))]
+            with span("render", f"plantuml_{fmt}") as call_span:
+                futures = [
+                    (batch, self._pool.submit(worker.render_batch, [code for _, code in batch], self.timeout))
+                    for worker, batch in zip(workers, batches) if batch
+                ]
+                for batch, future in futures:
+                    for (key, _), result in zip(batch, future.result()):
+                        results[key] = result
+                        if result.ok:
+                            call_span.add_bytes(len(result.data))
+                            self._store(key, result.data)
+
+        return [results[key] for key in keys]
+
+    async def arender_many(self, codes: List[str], fmt: str = "svg") -> List[RenderResult]:
+        return await run_blocking(self.render_many, codes, fmt)
+
+    def render(self, code: str, fmt: str = "svg") -> bytes:
+        result = self.render_many([code], fmt)[0]
+        if not result.ok:
+            raise PlantUMLError(result.error)
+        return result.data
+
+    def close(self):
+        with self._lock:
+            workers = [worker for pool in self._workers.values() for worker in pool]
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+        self._pool.shutdown(wait=False)
+
+@lru_cache()
+def get_plantuml_renderer() -> PlantUMLRenderer:
+    settings = get_settings()
+    return PlantUMLRenderer(
+        java=settings.plantuml_java_path,
+        jar=os.path.abspath(settings.plantuml_jar_path),
+        workers=settings.plantuml_workers,
+        timeout=settings.plantuml_render_timeout,
+        cache_size=settings.plantuml_cache_size,
+    )
+
+def close_plantuml_renderer():
+    if get_plantuml_renderer.cache_info().currsize:
+        get_plantuml_renderer().close()
+        get_plantuml_renderer.cache_clear()
+
+def render_plantuml_to_png(code: str, name_hint: str) -> str:
+    """Render one diagram to a PNG file under output/diagrams and return its path."""
+    png = get_plantuml_renderer().render(code, "png")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    png_path = os.path.join(OUTPUT_DIR, f"{name_hint}_{hashlib.sha256(png).hexdigest()[:16]}.png")
+    with open(png_path, "wb") as f:
+        f.write(png)
     return png_path
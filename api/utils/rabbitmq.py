@@ -1,31 +1,125 @@
 import pika
 import json
+import logging
+import threading
+import uuid
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+from pika.exceptions import AMQPError
 from api.config import get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-def publish_event(payload: dict, routing_key: str = None):
-    try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=settings.rabbitmq_host)
-        )
-        channel = connection.channel()
+class RabbitMQPublisher:
+    """
+    Long-lived publisher: one connection and channel per process, exchange declared once.
 
-        channel.exchange_declare(
-            exchange=settings.rabbitmq_exchange,
-            exchange_type=settings.rabbitmq_exchange_type,
-            durable=True,
-            auto_delete=False
-        )
+    With confirms enabled the channel is in publisher-confirm mode, so each publish
+    returns once the broker has confirmed that message. A broken connection is reopened
+    and only the messages not yet confirmed are published again. A confirm lost in
+    flight can still duplicate a message, so every message carries a `message_id`
+    that stays the same across retries; consumers dedupe on it or are idempotent
+    (the job pool claims each job once).
+    """
+
+    def __init__(self, host: str, exchange: str, exchange_type: str, confirm: bool = True, heartbeat: int = 60):
+        self.host = host
+        self.exchange = exchange
+        self.exchange_type = exchange_type
+        self.confirm = confirm
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._connection: Optional[pika.BlockingConnection] = None
+        self._channel = None
+        self._exchange_declared = False
 
-        channel.basic_publish(
-            exchange=settings.rabbitmq_exchange,
-            routing_key=routing_key or settings.rabbitmq_routing_key,
-            body=json.dumps(payload),
-            properties=pika.BasicProperties(delivery_mode=2)
+    def _ensure_channel(self):
+        if self._channel is not None and self._channel.is_open and self._connection.is_open:
+            return self._channel
+
+        self._close()
+        self._connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=self.host, heartbeat=self.heartbeat)
         )
+        channel = self._connection.channel()
+
+        if not self._exchange_declared:
+            channel.exchange_declare(
+                exchange=self.exchange,
+                exchange_type=self.exchange_type,
+                durable=True,
+                auto_delete=False
+            )
+            self._exchange_declared = True
+
+        if self.confirm:
+            channel.confirm_delivery()
+
+        self._channel = channel
+        return channel
 
-        connection.close()
+    def publish_batch(self, messages: Iterable[Tuple[str, dict]], priority: Optional[int] = None):
+        """Publish (routing_key, payload) pairs; with confirms, returns once all are confirmed."""
+        pending = [(routing_key, payload, uuid.uuid4().hex) for routing_key, payload in messages]
+        with self._lock:
+            retried = False
+            while pending:
+                try:
+                    channel = self._ensure_channel()
+                    while pending:
+                        routing_key, payload, message_id = pending[0]
+                        channel.basic_publish(
+                            exchange=self.exchange,
+                            routing_key=routing_key,
+                            body=json.dumps(payload),
+                            properties=pika.BasicProperties(delivery_mode=2, priority=priority, message_id=message_id)
+                        )
+                        pending.pop(0)
+                        retried = False
+                except AMQPError:
+                    # Stale connection (broker restart, missed heartbeats) or a nack: reconnect and
+                    # resend what is unconfirmed; give up after two failures in a row
+                    if retried:
+                        raise
+                    from api.utils.tracing import record_retry
 
+                    record_retry("rabbitmq", self.exchange)
+                    retried = True
+                    self._close()
+
+    def publish(self, payload: dict, routing_key: str, priority: Optional[int] = None):
+        self.publish_batch([(routing_key, payload)], priority)
+
+    def _close(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except AMQPError:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+@lru_cache()
+def get_publisher() -> RabbitMQPublisher:
+    return RabbitMQPublisher(
+        host=settings.rabbitmq_host,
+        exchange=settings.rabbitmq_exchange,
+        exchange_type=settings.rabbitmq_exchange_type,
+        confirm=settings.rabbitmq_publisher_confirms,
+        heartbeat=settings.rabbitmq_heartbeat,
+    )
+
+def close_publisher():
+    if get_publisher.cache_info().currsize:
+        get_publisher().close()
+
+def publish_event(payload: dict, routing_key: str = None):
+    try:
+        get_publisher().publish(payload, routing_key or settings.rabbitmq_routing_key)
     except Exception as e:
-        print(f"[RabbitMQ] Failed to publish event: {e}")
+        logger.warning(f"[RabbitMQ] Failed to publish event: {e}")
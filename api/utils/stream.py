@@ -0,0 +1,25 @@
+from typing import Any, Dict
+from langgraph.config import get_stream_writer
+
+def stream_partial(node: str, section: str, content: Any, **metadata):
+    """
+    Push a partial section (e.g. one guide chunk) to clients of /iba/run/stream.
+
+    A no-op when the graph is not being streamed, or when called outside a graph run.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"node": node, "section": section, "content": content, **metadata})
+
+def stream_node_completed(node: str, update: Dict):
+    """
+    Report a step that finished inside a composite node (e.g. the guide chain), so
+    /iba/run/stream can send its sections without waiting for the whole node.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"event": "node_completed", "node": node, "update": update})
@@ -0,0 +1,208 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+from api.config import get_settings
+from api.utils.emitter import emit_iba_event
+
+# Tracing for IBA runs: every graph node gets a NodeTrace (set in a context variable
+# while the node runs), and every LLM / Mongo / render call inside it is recorded as a
+# span against that trace. Node summaries are attached to the state (`trace`), emitted
+# as `iba.node.trace` events and exported as Prometheus metrics.
+
+NODE_DURATION = Histogram(
+    "iba_node_duration_seconds", "Wall time of one IBA graph node", ["node", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+CALL_DURATION = Histogram(
+    "iba_call_duration_seconds", "Wall time of one LLM, Mongo or render call", ["node", "kind", "name"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+CALL_ERRORS = Counter("iba_call_errors_total", "LLM, Mongo or render calls that raised", ["node", "kind", "name"])
+CALL_RETRIES = Counter("iba_call_retries_total", "Retried LLM, Mongo, render or publish calls", ["node", "kind", "name"])
+CALL_BYTES = Counter("iba_call_bytes_total", "Bytes sent and received by LLM, Mongo or render calls", ["node", "kind", "name"])
+LLM_TOKENS = Counter("iba_llm_tokens_total", "LLM tokens by node, model and type", ["node", "model", "type"])
+LLM_COST = Counter("iba_llm_cost_usd_total", "Estimated LLM spend in USD", ["node", "model"])
+
+NO_NODE = "none"
+
+_current_trace: contextvars.ContextVar[Optional["NodeTrace"]] = contextvars.ContextVar("iba_node_trace", default=None)
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """USD estimate from `llm_pricing_per_1k_tokens`; unknown models cost 0."""
+    prices = get_settings().llm_pricing_per_1k_tokens.get(model)
+    if not prices:
+        return 0.0
+    cached_price = prices.get("cached", prices.get("prompt", 0.0))
+    return (
+        (prompt_tokens - cached_tokens) * prices.get("prompt", 0.0)
+        + cached_tokens * cached_price
+        + completion_tokens * prices.get("completion", 0.0)
+    ) / 1000
+
+class Span:
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.bytes = 0
+        self.retries = 0
+
+    def add_bytes(self, count: int):
+        self.bytes += count
+
+    def retry(self):
+        self.retries += 1
+
+class NodeTrace:
+    def __init__(self, node: str):
+        self.node = node
+        self.started = time.perf_counter()
+        self.calls: Dict[str, Dict] = {}
+        self.tokens = {"prompt": 0, "completion": 0, "cached": 0}
+        self.cost_usd = 0.0
+        # Sync nodes run on executor threads and may fan out; keep updates atomic
+        self._lock = threading.Lock()
+
+    def _call(self, kind: str, name: str) -> Dict:
+        key = f"{kind}:{name}"
+        if key not in self.calls:
+            self.calls[key] = {"count": 0, "duration_ms": 0.0, "bytes": 0, "retries": 0, "errors": 0}
+        return self.calls[key]
+
+    def record_span(self, span: Span, duration: float, failed: bool):
+        with self._lock:
+            call = self._call(span.kind, span.name)
+            call["count"] += 1
+            call["duration_ms"] = round(call["duration_ms"] + duration * 1000, 2)
+            call["bytes"] += span.bytes
+            call["retries"] += span.retries
+            call["errors"] += int(failed)
+
+    def record_retry(self, kind: str, name: str):
+        with self._lock:
+            self._call(kind, name)["retries"] += 1
+
+    def record_tokens(self, prompt: int, completion: int, cached: int, cost: float):
+        with self._lock:
+            self.tokens["prompt"] += prompt
+            self.tokens["completion"] += completion
+            self.tokens["cached"] += cached
+            self.cost_usd += cost
+
+    def summary(self, status: str) -> Dict:
+        return {
+            "status": status,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "calls": self.calls,
+            "tokens": self.tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+def current_node() -> str:
+    trace = _current_trace.get()
+    return trace.node if trace else NO_NODE
+
+@contextmanager
+def span(kind: str, name: str):
+    """
+    Time one call made on behalf of the current node. The yielded Span takes byte
+    counts and retries; the call is recorded even when it raises.
+    """
+    trace = _current_trace.get()
+    current = Span(kind, name)
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield current
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        labels = (trace.node if trace else NO_NODE, kind, name)
+        CALL_DURATION.labels(*labels).observe(duration)
+        if current.bytes:
+            CALL_BYTES.labels(*labels).inc(current.bytes)
+        if current.retries:
+            CALL_RETRIES.labels(*labels).inc(current.retries)
+        if failed:
+            CALL_ERRORS.labels(*labels).inc()
+        if trace is not None:
+            trace.record_span(current, duration, failed)
+
+def record_retry(kind: str, name: str):
+    """Count a retry that happens outside a span (e.g. a publisher reconnect)."""
+    trace = _current_trace.get()
+    CALL_RETRIES.labels(current_node(), kind, name).inc()
+    if trace is not None:
+        trace.record_retry(kind, name)
+
+def record_llm_tokens(model: str, usage: Dict[str, int]):
+    """Record one LLM response's token usage (as returned by `extract_usage`) and its cost."""
+    node = current_node()
+    prompt, completion, cached = usage["prompt_tokens"], usage["completion_tokens"], usage["cached_tokens"]
+    cost = llm_cost(model, prompt, completion, cached)
+    LLM_TOKENS.labels(node, model, "prompt").inc(prompt)
+    LLM_TOKENS.labels(node, model, "completion").inc(completion)
+    LLM_TOKENS.labels(node, model, "cached").inc(cached)
+    LLM_COST.labels(node, model).inc(cost)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record_tokens(prompt, completion, cached, cost)
+
+def _finish(trace: NodeTrace, status: str, state) -> Dict:
+    summary = trace.summary(status)
+    NODE_DURATION.labels(trace.node, status).observe(summary["duration_ms"] / 1000)
+    emit_iba_event(
+        project_id=getattr(state, "project_id", None),
+        node=trace.node,
+        event_type="iba.node.trace",
+        status=status,
+        metadata=summary
+    )
+    return summary
+
+def _attach(node: str, summary: Dict, result):
+    if result is None:
+        return {"trace": {node: summary}}
+    if isinstance(result, dict):
+        return {**result, "trace": {node: summary}}
+    # Full-state return: the reducer merges this node's entry into the existing trace
+    result.trace = {node: summary}
+    return result
+
+def traced_node(node: str, fn: Callable) -> Callable:
+    """Wrap a graph node so its calls are traced and its summary lands in `state.trace`."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            trace = NodeTrace(node)
+            token = _current_trace.set(trace)
+            try:
+                result = await fn(state)
+            except BaseException:
+                _finish(trace, "failed", state)
+                raise
+            finally:
+                _current_trace.reset(token)
+            return _attach(node, _finish(trace, "completed", state), result)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        trace = NodeTrace(node)
+        token = _current_trace.set(trace)
+        try:
+            result = fn(state)
+        except BaseException:
+            _finish(trace, "failed", state)
+            raise
+        finally:
+            _current_trace.reset(token)
+        return _attach(node, _finish(trace, "completed", state), result)
+    return wrapper
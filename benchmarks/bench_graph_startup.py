@@ -0,0 +1,41 @@
+"""
+Startup-time benchmark for the IBA graph.
+
+Compares building + compiling the graph on every request (the old behaviour)
+with reusing the graph compiled once at startup.
+
+    python -m benchmarks.bench_graph_startup --iterations 50
+"""
+import argparse
+import statistics
+import time
+
+from api.iba.graph import build_iba_graph, get_iba_graph
+
+
+def _time_ms(fn, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    get_iba_graph.cache_clear()
+    cold = _time_ms(get_iba_graph, 1)[0]
+    rebuild = _time_ms(build_iba_graph, args.iterations)
+    shared = _time_ms(get_iba_graph, args.iterations)
+
+    print(f"startup compile (once):   {cold:8.3f} ms")
+    print(f"per-request rebuild:      median {statistics.median(rebuild):8.3f} ms  max {max(rebuild):8.3f} ms")
+    print(f"per-request shared graph: median {statistics.median(shared):8.3f} ms  max {max(shared):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Offline end-to-end benchmark for the IBA pipeline.
+
+Runs the full graph from `build_iba_graph` against synthetic projects of several
+sizes, with a deterministic fake chat model and an in-memory Mongo, so it needs no
+network, no broker and no API budget. Reports end-to-end and per-node latency
+(from the run's `trace`) and memory for each paradigm/size.
+
+    python -m benchmarks.bench_iba_pipeline --sizes 10 100 1000 10000 --llm-latency-ms 50
+    python -m benchmarks.bench_iba_pipeline --json results.json
+    python -m benchmarks.bench_iba_pipeline --compare results.json --tolerance 0.25
+
+With --compare, exits non-zero when any scenario's median end-to-end latency is
+more than `tolerance` above the baseline file's. The event loop is watched while the
+runs execute; with --max-loop-lag-ms the benchmark also fails when any node blocks
+the loop for longer than that (use --concurrent-runs to overlap runs):
+
+    python -m benchmarks.bench_iba_pipeline --concurrent-runs 4 --max-loop-lag-ms 100
+
+`python -m benchmarks.check_loop_lag` is the pass/fail version of that gate for CI.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+
+class _NullPublisher:
+    """Swallows IBA events instead of publishing them to RabbitMQ."""
+
+    def __init__(self):
+        self.published = 0
+
+    def publish(self, payload: dict, routing_key: str, priority=None):
+        self.published += 1
+
+    def publish_batch(self, messages, priority=None):
+        self.published += len(list(messages))
+
+    def close(self):
+        pass
+
+
+def _configure_environment(args):
+    # Settings are read on the first import of api.*, so set offline defaults first
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ.setdefault("MONGODB_URI", "mongodb://offline")
+    os.environ["LLM_CACHE_BACKEND"] = "memory" if args.llm_cache else "none"
+    os.environ["IBA_INCREMENTAL"] = "true" if args.incremental else "false"
+    # The gateway's RPM/TPM budgets would otherwise pace the fake model like the real API
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.rpm)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.tpm)
+    # PDF export needs WeasyPrint's native libraries; only measured with --pdf
+    os.environ["IBA_PDF_MODE"] = "sync" if args.pdf else "off"
+
+
+def _install_fakes(args):
+    from api.dal import mongo
+    from api.iba.llm import set_chat_model_factory
+    from api.utils import rabbitmq
+    from benchmarks.fake_llm import fake_chat_model_factory
+    from benchmarks.fake_mongo import FakeAsyncMongoClient, FakeMongoClient
+
+    client = FakeMongoClient(latency_ms=args.mongo_latency_ms)
+    async_client = FakeAsyncMongoClient(client)
+    mongo.get_mongo_client = lambda: client
+    mongo.get_async_mongo_client = lambda: async_client
+
+    publisher = _NullPublisher()
+    rabbitmq.get_publisher = lambda: publisher
+
+    set_chat_model_factory(fake_chat_model_factory(
+        latency_ms=args.llm_latency_ms, ms_per_output_token=args.llm_ms_per_token,
+    ))
+    return client
+
+
+async def _run_once(graph, project_id: str, trace_memory: bool) -> Dict:
+    from api.iba.state import IBAState
+
+    node_memory: Dict[str, float] = {}
+    final_values = None
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    async for mode, chunk in graph.astream(IBAState(project_id=project_id), stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_values = chunk
+        elif trace_memory:
+            # Heap in use when each node finishes (parallel branches share the heap)
+            current, _ = tracemalloc.get_traced_memory()
+            for node in chunk:
+                node_memory[node] = current / 2**20
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    peak_mb = None
+    if trace_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    state = IBAState(**final_values)
+    return {
+        "e2e_ms": elapsed_ms,
+        "peak_mb": peak_mb,
+        "nodes": {node: summary["duration_ms"] for node, summary in (state.trace or {}).items()},
+        "node_memory_mb": node_memory,
+        "llm_calls": sum(usage.get("calls", 0) for usage in (state.llm_usage or {}).values()),
+        "adrs": len(state.adrs or []),
+    }
+
+
+def _summarize(runs: List[Dict], loop_stats: Dict) -> Dict:
+    nodes = sorted({node for run in runs for node in run["nodes"]})
+    summary = {
+        "e2e_ms_median": statistics.median(run["e2e_ms"] for run in runs),
+        "e2e_ms_max": max(run["e2e_ms"] for run in runs),
+        "llm_calls": runs[-1]["llm_calls"],
+        "adrs": runs[-1]["adrs"],
+        "nodes_ms_median": {
+            node: statistics.median(run["nodes"].get(node, 0.0) for run in runs) for node in nodes
+        },
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "loop_max_lag_ms": loop_stats["max_lag_ms"],
+        "loop_stalls": loop_stats["blocked"],
+    }
+    if runs[-1]["peak_mb"] is not None:
+        summary["peak_traced_mb"] = max(run["peak_mb"] for run in runs)
+        summary["node_memory_mb"] = runs[-1]["node_memory_mb"]
+    return summary
+
+
+def _print_scenario(name: str, summary: Dict):
+    print(f"\n{name}")
+    print(f"  end-to-end: median {summary['e2e_ms_median']:9.1f} ms  max {summary['e2e_ms_max']:9.1f} ms"
+          f"  llm calls {summary['llm_calls']}  adrs {summary['adrs']}  max rss {summary['max_rss_mb']:.1f} MB")
+    print(f"  event loop: max lag {summary['loop_max_lag_ms']:.1f} ms  stalls {summary['loop_stalls']}")
+    if "peak_traced_mb" in summary:
+        print(f"  peak traced heap: {summary['peak_traced_mb']:.1f} MB")
+    for node, ms in sorted(summary["nodes_ms_median"].items(), key=lambda item: -item[1]):
+        memory = summary.get("node_memory_mb", {}).get(node)
+        memory_text = f"  heap {memory:7.1f} MB" if memory is not None else ""
+        print(f"    {node:<30} {ms:9.1f} ms{memory_text}")
+
+
+def _check_loop_lag(results: Dict, max_lag_ms: float) -> bool:
+    blocked = {name: s["loop_max_lag_ms"] for name, s in results.items() if s["loop_max_lag_ms"] > max_lag_ms}
+    for name, lag in blocked.items():
+        print(f"{name:<28} event loop blocked for {lag:.1f} ms (limit {max_lag_ms:.1f} ms)")
+    return not blocked
+
+
+def _compare(results: Dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    ok = True
+    for name, summary in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["e2e_ms_median"], summary["e2e_ms_median"]
+        change = (after - before) / before if before else 0.0
+        flag = "REGRESSION" if change > tolerance else "ok"
+        ok = ok and change <= tolerance
+        print(f"{name:<28} {before:9.1f} ms -> {after:9.1f} ms  ({change:+.1%})  {flag}")
+    return ok
+
+
+async def _bench(args, client) -> Dict:
+    from api.config import get_settings
+    from api.iba.graph import build_iba_graph
+    from api.utils.loop_monitor import LoopLagMonitor
+    from benchmarks.synthetic import seed_project
+
+    db = client[get_settings().mongodb_database]
+    graph = build_iba_graph()
+    threshold = args.max_loop_lag_ms / 1000 if args.max_loop_lag_ms else get_settings().iba_loop_lag_threshold_seconds
+    monitor = LoopLagMonitor(interval=0.01, threshold=threshold)
+    await monitor.start()
+
+    results = {}
+    for paradigm in args.paradigms:
+        for size in args.sizes:
+            project_id = f"bench-{paradigm}-{size}"
+            seed_project(db, project_id, paradigm, size, seed=args.seed)
+            # As the app does at start-up; the seeded documents stand in for the Mongo server's
+            gc.collect()
+            gc.freeze()
+            for _ in range(args.warmup):
+                await _run_once(graph, project_id, trace_memory=False)
+            monitor.reset()
+            runs = []
+            for _ in range(args.iterations):
+                runs.extend(await asyncio.gather(*(
+                    _run_once(graph, project_id, args.trace_memory) for _ in range(args.concurrent_runs)
+                )))
+            name = f"{paradigm}/{size}"
+            results[name] = _summarize(runs, monitor.reset())
+            _print_scenario(name, results[name])
+    await monitor.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--paradigms", nargs="+", default=["application", "data_pipeline"])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0, help="gateway requests-per-minute budget (0 = off)")
+    parser.add_argument("--tpm", type=int, default=0, help="gateway tokens-per-minute budget (0 = off)")
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0)
+    parser.add_argument("--concurrent-runs", type=int, default=1, help="runs of the same project started together")
+    parser.add_argument("--max-loop-lag-ms", type=float, help="fail if the event loop stalls longer than this")
+    parser.add_argument("--trace-memory", action="store_true", help="tracemalloc per node (slows the run)")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the in-memory LLM response cache on")
+    parser.add_argument("--incremental", action="store_true", help="reuse per-chunk outputs between iterations")
+    parser.add_argument("--pdf", action="store_true", help="also export the PDF (needs WeasyPrint)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from a previous --json run")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    if args.trace_memory and args.concurrent_runs > 1:
+        parser.error("--trace-memory measures one run at a time; use --concurrent-runs 1")
+
+    _configure_environment(args)
+    client = _install_fakes(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        # render_output writes under ./output; keep benchmark files out of the checkout
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(_bench(args, client))
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    ok = True
+    if args.max_loop_lag_ms is not None:
+        ok = _check_loop_lag(results, args.max_loop_lag_ms) and ok
+    if args.compare:
+        ok = _compare(results, args.compare, args.tolerance) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark for the PlantUML encoder.
+
+Compares the previous bit-by-bit encoder (string concatenation per sextet) with the
+bulk base64 + translate encoder, cold and cached, across diagram sizes, and checks
+that both produce identical output.
+
+    python -m benchmarks.bench_plantuml_encoder --lines 10 100 1000 10000 --iterations 20
+"""
+import argparse
+import random
+import statistics
+import time
+import zlib
+
+from api.utils import embed_system_diagrams
+from api.utils.embed_system_diagrams import PLANTUML_ALPHABET, _encode_base64, encode_plantuml
+
+
+def legacy_encode_base64(data: bytes) -> str:
+    """The encoder this module replaced, kept here as the reference."""
+    res = ""
+    buffer = 0
+    buffer_len = 0
+
+    for byte in data:
+        buffer = (buffer << 8) | byte
+        buffer_len += 8
+        while buffer_len >= 6:
+            buffer_len -= 6
+            res += PLANTUML_ALPHABET[(buffer >> buffer_len) & 0x3F]
+
+    if buffer_len > 0:
+        res += PLANTUML_ALPHABET[(buffer << (6 - buffer_len)) & 0x3F]
+
+    return res
+
+
+def legacy_encode_plantuml(plantuml_text: str) -> str:
+    return legacy_encode_base64(zlib.compress(plantuml_text.encode("utf-8"))[2:-4])
+
+
+def synthetic_diagram(lines: int, seed: int = 0) -> str:
+    """ERD-like diagram with `lines` relationship lines."""
+    rng = random.Random(seed)
+    entities = [f"Entity{i}" for i in range(max(2, lines // 5))]
+    body = "\n".join(
+        f"{rng.choice(entities)} \"{rng.randint(0, 1)}..*\" --> \"1\" {rng.choice(entities)} : rel_{i}"
+        for i in range(lines)
+    )
+    return f"@startuml\n{body}\n@enduml"
+
+
+def _median_ms(fn, iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _cold_encode(code: str) -> str:
+    embed_system_diagrams._cache.clear()
+    return encode_plantuml(code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    # Edge cases for the trailing partial sextet
+    for data in (b"", b"\x00", b"\xff\xff", b"\x01\x02\x03", bytes(range(256))):
+        assert _encode_base64(data) == legacy_encode_base64(data), data
+
+    print(f"{'lines':>7} {'bytes':>9} {'legacy ms':>11} {'bulk ms':>9} {'cached ms':>10} {'speedup':>9}")
+    for lines in args.lines:
+        code = synthetic_diagram(lines)
+        assert _cold_encode(code) == legacy_encode_plantuml(code), f"output differs for {lines} lines"
+
+        legacy = _median_ms(lambda: legacy_encode_plantuml(code), args.iterations)
+        bulk = _median_ms(lambda: _cold_encode(code), args.iterations)
+        encode_plantuml(code)
+        cached = _median_ms(lambda: encode_plantuml(code), args.iterations)
+        print(f"{lines:>7} {len(code):>9} {legacy:>11.3f} {bulk:>9.3f} {cached:>10.4f} {legacy / bulk:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Event-loop lag check for the IBA pipeline.
+
+Overlaps several runs of the full graph against a synthetic project, with the offline
+fakes from the benchmark (fake chat model, in-memory Mongo, no broker), while a
+LoopLagMonitor samples the loop. Exits non-zero when any stall is longer than
+--max-lag-ms, naming the scenario, so a node or helper that blocks the loop fails CI:
+
+    python -m benchmarks.check_loop_lag
+    python -m benchmarks.check_loop_lag --sizes 1000 --concurrent-runs 4 --max-lag-ms 100
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+from typing import Dict
+
+from benchmarks.bench_iba_pipeline import _configure_environment, _install_fakes, _run_once
+
+
+async def _check(args, client) -> Dict[str, Dict]:
+    from api.config import get_settings
+    from api.iba.graph import build_iba_graph
+    from api.utils.loop_monitor import LoopLagMonitor
+    from benchmarks.synthetic import seed_project
+
+    db = client[get_settings().mongodb_database]
+    graph = build_iba_graph()
+    monitor = LoopLagMonitor(interval=0.005, threshold=args.max_lag_ms / 1000)
+
+    results = {}
+    for paradigm in args.paradigms:
+        for size in args.sizes:
+            project_id = f"lag-{paradigm}-{size}"
+            seed_project(db, project_id, paradigm, size, seed=args.seed)
+            # Same as the app's start-up freeze (iba_gc_freeze_on_startup)
+            gc.collect()
+            gc.freeze()
+
+            # First-run costs (lazy imports, tokenizer files) are start-up work, not what this checks
+            await _run_once(graph, project_id, trace_memory=False)
+
+            await monitor.start()
+            monitor.reset()
+            for _ in range(args.rounds):
+                runs = await asyncio.gather(*(
+                    _run_once(graph, project_id, trace_memory=False) for _ in range(args.concurrent_runs)
+                ))
+                if any(not run["adrs"] for run in runs):
+                    raise RuntimeError(f"{paradigm}/{size}: a run produced no ADRs")
+            results[f"{paradigm}/{size}"] = monitor.reset()
+            await monitor.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--paradigms", nargs="+", default=["application", "data_pipeline"])
+    parser.add_argument("--concurrent-runs", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--max-lag-ms", type=float, default=100.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # The benchmark's environment: no LLM cache or chunk reuse, so every run does the full work
+    fake_args = argparse.Namespace(
+        llm_cache=False, incremental=False, rpm=0, tpm=0, pdf=False,
+        llm_latency_ms=args.llm_latency_ms, llm_ms_per_token=0.0, mongo_latency_ms=args.mongo_latency_ms,
+    )
+    _configure_environment(fake_args)
+    client = _install_fakes(fake_args)
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(_check(args, client))
+        finally:
+            os.chdir(cwd)
+
+    failed = False
+    for name, stats in results.items():
+        ok = stats["max_lag_ms"] <= args.max_lag_ms
+        failed = failed or not ok
+        print(f"{name:<28} max lag {stats['max_lag_ms']:7.1f} ms  stalls {stats['blocked']:3}  {'ok' if ok else 'FAIL'}")
+    if failed:
+        print(f"Event loop blocked for longer than {args.max_lag_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Deterministic stand-in for ChatOpenAI used by the offline benchmarks.
+
+Responses are derived from a hash of the prompt, so repeated runs produce the same
+output (and the same chunk fingerprints). Each call sleeps for a configurable latency
+plus a per-completion-token delay, and reports token usage the way the OpenAI
+community client does, so the usage/trace bookkeeping is exercised as in production.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from api.iba.chunking import count_tokens
+
+
+class FakeChatModel(BaseChatModel):
+    model_name: str = "gpt-3.5-turbo"
+    temperature: float = 0.0
+    latency_ms: float = 50.0
+    ms_per_output_token: float = 0.0
+    completion_words: int = 120
+
+    def __init__(self, model: Optional[str] = None, **kwargs: Any):
+        # Accept (and ignore) ChatOpenAI-only arguments such as openai_api_key
+        fields = {k: v for k, v in kwargs.items() if k in type(self).model_fields}
+        if model:
+            fields["model_name"] = model
+        super().__init__(**fields)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _seed(self, messages: List[BaseMessage]) -> str:
+        text = "\n".join(str(m.content) for m in messages)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        seed = self._seed(messages)
+        prompt = "\n".join(str(m.content) for m in messages)
+
+        if '"adrs"' in prompt or "ADRList" in prompt:
+            count = 1 + int(seed[0], 16) % 3
+            return json.dumps({
+                "adrs": [
+                    {
+                        "title": f"Decision {seed[i * 6:i * 6 + 6]}",
+                        "context": f"Context for decision {i} " + "lorem " * 20,
+                        "decision": f"Adopt option {seed[i * 4:i * 4 + 4]}",
+                        "alternatives": "Option A; option B",
+                        "rationale": "Deterministic benchmark rationale " + "ipsum " * 15,
+                    }
+                    for i in range(count)
+                ]
+            })
+
+        if "PlantUML" in prompt:
+            return (
+                "```plantuml\n@startuml\n"
+                + "\n".join(f'package "P{i}" {{\n  [Component{seed[i:i + 4]}]\n}}' for i in range(6))
+                + "\n@enduml\n```"
+            )
+
+        words = " ".join(f"w{seed[i % 60:i % 60 + 4]}" for i in range(self.completion_words))
+        return f"## Section {seed[:8]}\n\n- {words}\n"
+
+    def _usage(self, messages: List[BaseMessage], content: str) -> dict:
+        prompt = "\n".join(str(m.content) for m in messages)
+        return {
+            "prompt_tokens": count_tokens(prompt, self.model_name),
+            "completion_tokens": count_tokens(content, self.model_name),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+
+    def _result(self, messages: List[BaseMessage]) -> tuple:
+        content = self._respond(messages)
+        usage = self._usage(messages, content)
+        delay = (self.latency_ms + self.ms_per_output_token * usage["completion_tokens"]) / 1000
+        message = AIMessage(content=content, response_metadata={"token_usage": usage, "model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)]), delay
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        result, delay = self._result(messages)
+        time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        result, delay = self._result(messages)
+        await asyncio.sleep(delay)
+        return result
+
+
+def fake_chat_model_factory(latency_ms: float = 50.0, ms_per_output_token: float = 0.0, completion_words: int = 120):
+    """Factory for `api.iba.llm.set_chat_model_factory`."""
+    def factory(**kwargs: Any) -> FakeChatModel:
+        return FakeChatModel(
+            latency_ms=latency_ms,
+            ms_per_output_token=ms_per_output_token,
+            completion_words=completion_words,
+            **kwargs,
+        )
+    return factory
@@ -0,0 +1,188 @@
+"""
+In-memory Mongo stand-in for the offline benchmarks (mongomock-style, no server).
+
+Implements the subset of the pymongo sync/async collection API the IBA pipeline uses:
+find / find_one with equality and `$in` filters and include/exclude projections,
+replace_one (upsert), insert_many and create_index. Documents are stored BSON-encoded
+and decoded on every read, so result sizes cost roughly what they cost coming off the
+wire. An optional per-query latency simulates the network round trip. The async API
+does its matching and decoding in a worker thread, as a real driver does its socket
+reads and BSON decoding off the caller's code path, so it never stalls the event loop.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import bson
+
+
+def _matches(doc: Dict, query: Dict) -> bool:
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict) and "$in" in condition:
+            if value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        projected = {k: doc[k] for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    return {k: v for k, v in doc.items() if k not in projection}
+
+
+class FakeCollection:
+    def __init__(self, name: str, latency_ms: float = 0.0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self._docs: Dict[Any, tuple] = {}  # _id → (decoded doc for matching, BSON for reads)
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def _sleep(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _store(self, doc: Dict):
+        with self._lock:
+            if "_id" not in doc:
+                self._next_id += 1
+                doc = {"_id": f"{self.name}-{self._next_id}", **doc}
+            self._docs[doc["_id"]] = (doc, bson.encode(doc))
+
+    def _find(self, query: Optional[Dict], projection: Optional[Dict], limit: int = 0) -> List[Dict]:
+        query = query or {}
+        results = []
+        if set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            candidates = [self._docs[query["_id"]]] if query["_id"] in self._docs else []
+        else:
+            candidates = list(self._docs.values())
+        for doc, encoded in candidates:
+            if _matches(doc, query):
+                results.append(_project(bson.decode(encoded), projection))
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> List[Dict]:
+        self._sleep()
+        return self._find(query, projection)
+
+    def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        self._sleep()
+        found = self._find(query, projection, limit=1)
+        return found[0] if found else None
+
+    def _replace(self, query: Dict, replacement: Dict, upsert: bool):
+        with self._lock:
+            existing = self._find(query, None, limit=1)
+            if existing:
+                replacement = {**replacement, "_id": existing[0]["_id"]}
+            elif not upsert:
+                return
+            self._store(replacement)
+
+    def replace_one(self, query: Dict, replacement: Dict, upsert: bool = False):
+        self._sleep()
+        self._replace(query, replacement, upsert)
+
+    def insert_many(self, docs: Iterable[Dict]):
+        for doc in docs:
+            self._store(doc)
+
+    def create_index(self, *args, **kwargs) -> str:
+        return kwargs.get("name", "fake_index")
+
+    def count_documents(self, query: Optional[Dict] = None) -> int:
+        return len(self._find(query, None))
+
+
+class FakeDatabase:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name, self.latency_ms)
+        return self._collections[name]
+
+
+class FakeMongoClient:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self._databases: Dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(self.latency_ms)
+        return self._databases[name]
+
+    def close(self):
+        pass
+
+
+class _AsyncCursor:
+    def __init__(self, collection: FakeCollection, query: Optional[Dict], projection: Optional[Dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        if self._collection.latency_ms:
+            await asyncio.sleep(self._collection.latency_ms / 1000)
+        return await asyncio.to_thread(self._collection._find, self._query, self._projection, length or 0)
+
+
+class FakeAsyncCollection:
+    def __init__(self, collection: FakeCollection):
+        self._collection = collection
+
+    async def _sleep(self):
+        if self._collection.latency_ms:
+            await asyncio.sleep(self._collection.latency_ms / 1000)
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> _AsyncCursor:
+        return _AsyncCursor(self._collection, query, projection)
+
+    async def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        await self._sleep()
+        found = await asyncio.to_thread(self._collection._find, query, projection, 1)
+        return found[0] if found else None
+
+    async def replace_one(self, query: Dict, replacement: Dict, upsert: bool = False):
+        await self._sleep()
+        await asyncio.to_thread(self._collection._replace, query, replacement, upsert)
+
+    async def create_index(self, *args, **kwargs) -> str:
+        return self._collection.create_index(*args, **kwargs)
+
+
+class FakeAsyncDatabase:
+    def __init__(self, database: FakeDatabase):
+        self._database = database
+
+    def __getitem__(self, name: str) -> FakeAsyncCollection:
+        return FakeAsyncCollection(self._database[name])
+
+
+class FakeAsyncMongoClient:
+    """Async view over a FakeMongoClient; both see the same data."""
+
+    def __init__(self, client: FakeMongoClient):
+        self._client = client
+
+    def __getitem__(self, name: str) -> FakeAsyncDatabase:
+        return FakeAsyncDatabase(self._client[name])
+
+    async def close(self):
+        pass
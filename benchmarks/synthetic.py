@@ -0,0 +1,109 @@
+"""
+Synthetic IBA projects for the offline benchmarks.
+
+`seed_project` writes a project_map, its referenced artifacts and a few PlantUML
+diagrams into a (fake) database. Artifacts are spread round-robin over the
+collections typical for the paradigm; generation is seeded, so a given
+(project_id, paradigm, size, seed) always produces the same documents.
+"""
+import random
+from typing import Dict, List
+
+from api.dal.project_map_loader import PROJECTMAP_COLLECTIONS
+from api.iba.steps.embed_diagrams import DIAGRAM_SUGGESTIONS
+
+PARADIGM_KEYS = {
+    "application": [
+        "feature_ids", "flow_ids", "entity_ids", "persona_ids", "role_ids", "story_ids", "requirement_ids",
+    ],
+    "data_pipeline": [
+        "entity_ids", "dag_task_ids", "dag_definition_ids", "job_definition_ids", "source_system_ids",
+        "raw_data_schema_ids", "target_data_model_ids", "transformation_rule_ids", "data_quality_rule_ids",
+        "lineage_definition_ids",
+    ],
+}
+
+TECH_STACK = {
+    "frontend": "React",
+    "backend": "FastAPI",
+    "database": "MongoDB",
+    "messaging": "Kafka",
+    "orchestration": "Airflow",
+    "data_processing": "Spark",
+    "storage_layer": "HDFS",
+    "observability_stack": ["Prometheus", "Grafana"],
+    "other_tools": ["Docker", "Kubernetes"],
+}
+
+WORDS = (
+    "customer order payment invoice ledger account shipment inventory catalog product "
+    "schedule batch stream partition checkpoint lineage schema quality rule source target"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _artifact(rng: random.Random, collection: str, id_field: str, artifact_id: str, index: int) -> Dict:
+    doc = {
+        id_field: artifact_id,
+        "name": f"{collection[:-1].replace('_', ' ').title()} {index}",
+        "description": _sentence(rng, 25),
+        "tags": rng.sample(WORDS, 3),
+    }
+    if collection == "entities":
+        doc["attributes"] = [
+            {"name": f"{rng.choice(WORDS)}_{a}", "type": rng.choice(["string", "int", "date"]), "description": _sentence(rng, 8)}
+            for a in range(5)
+        ]
+    elif collection == "flows":
+        doc["flow_name"] = doc["name"]
+        doc["steps"] = [_sentence(rng, 6) for _ in range(4)]
+    elif collection == "stories":
+        doc["summary"] = _sentence(rng, 8)
+        doc["acceptance_criteria"] = [_sentence(rng, 10) for _ in range(3)]
+    elif collection == "dag_tasks":
+        doc["upstream"] = [f"task-{rng.randrange(max(index, 1))}" for _ in range(2)]
+    return doc
+
+
+def _diagram(rng: random.Random, project_id: str, diagram_type: str, index: int) -> Dict:
+    body = "\n".join(f"[{rng.choice(WORDS)}{i}] --> [{rng.choice(WORDS)}{i + 1}]" for i in range(20))
+    return {
+        "project_id": project_id,
+        "diagram_type": diagram_type,
+        "code": f"@startuml\ntitle {diagram_type} {index}\n{body}\n@enduml",
+    }
+
+
+def seed_project(db, project_id: str, paradigm: str, artifact_count: int, seed: int = 0) -> Dict[str, int]:
+    """Seed one project; returns artifact counts per collection."""
+    rng = random.Random(f"{project_id}:{paradigm}:{artifact_count}:{seed}")
+    keys = PARADIGM_KEYS[paradigm]
+    ids: Dict[str, List[str]] = {key: [] for key in keys}
+    docs: Dict[str, List[Dict]] = {}
+
+    for i in range(artifact_count):
+        key = keys[i % len(keys)]
+        collection, id_field = PROJECTMAP_COLLECTIONS[key]
+        artifact_id = f"{project_id}-{collection}-{i}"
+        ids[key].append(artifact_id)
+        docs.setdefault(collection, []).append(_artifact(rng, collection, id_field, artifact_id, i))
+
+    for collection, collection_docs in docs.items():
+        db[collection].insert_many(collection_docs)
+
+    db["project_map"].insert_many([{
+        "project_id": project_id,
+        "paradigm": paradigm,
+        "selected_tech_stack": TECH_STACK,
+        **ids,
+    }])
+    db["diagrams"].insert_many([
+        _diagram(rng, project_id, diagram_type, index)
+        for diagram_type in DIAGRAM_SUGGESTIONS[paradigm]
+        for index in range(2)
+    ])
+
+    return {collection: len(collection_docs) for collection, collection_docs in docs.items()}
@@ -1,11 +1,77 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import run_iba
+from api.config import get_settings
+from api.dal.indexes import check_indexes
+from api.dal.mongo import close_mongo_clients
+from api.iba.graph import get_iba_graph
+from api.jobs.pool import get_job_pool
+from api.routers import jobs, metrics, run_iba
+from api.utils.emitter import get_event_emitter
+from api.utils.executor import shutdown_blocking_executor
+from api.utils.llm_cache import get_llm_cache
+from api.utils.llm_gateway import close_openai_clients
+from api.utils.loop_monitor import get_loop_monitor
+from api.utils.pdf_renderer import close_pdf_renderer
+from api.utils.plantuml_renderer import close_plantuml_renderer, get_plantuml_renderer
+from api.utils.rabbitmq import close_publisher
+import asyncio
+import gc
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    await get_event_emitter().start()
+    await get_loop_monitor().start()
+
+    if settings.mongo_ensure_indexes_on_startup or settings.mongo_verify_query_plans_on_startup:
+        await asyncio.to_thread(
+            check_indexes,
+            ensure=settings.mongo_ensure_indexes_on_startup,
+            verify=settings.mongo_verify_query_plans_on_startup,
+            strict=settings.mongo_fail_on_collscan,
+        )
+
+    # Compile the IBA graph once; every request reuses it
+    started = time.perf_counter()
+    get_iba_graph()
+    logger.info(f"[IBA] Graph compiled in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    # Connect the LLM cache backend now rather than on the loop during the first run
+    await asyncio.to_thread(get_llm_cache)
+
+    # Start the PlantUML workers now so the first run does not pay the JVM start-up
+    renderer = get_plantuml_renderer()
+    if settings.plantuml_warm_on_startup and renderer.available:
+        await asyncio.to_thread(renderer.warm)
+
+    await get_job_pool().start()
+
+    # Modules, the compiled graph and clients live for the whole process; freezing them
+    # keeps full GC passes (which run on the loop thread and stall every run) short
+    if settings.iba_gc_freeze_on_startup:
+        gc.collect()
+        gc.freeze()
+    yield
+    await get_job_pool().stop()
+    await close_pdf_renderer(timeout=settings.iba_pdf_shutdown_timeout)
+    await get_loop_monitor().stop()
+    await get_event_emitter().stop(timeout=settings.iba_event_flush_timeout)
+    await close_mongo_clients()
+    await close_openai_clients()
+    close_publisher()
+    close_plantuml_renderer()
+    shutdown_blocking_executor()
 
 app = FastAPI(
     title="RAINA - Implementation Blueprint Agent",
     description="Service for parsing and reasoning on user stories to extract architecture-ready artifacts",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -18,3 +84,5 @@ app.add_middleware(
 # Register grouped routers
 
 app.include_router(run_iba.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
@@ -0,0 +1,6 @@
+import os
+
+# Settings are read on the first import of api.*; tests never reach these services
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("MONGODB_URI", "mongodb://test")
+os.environ.setdefault("PLANTUML_SERVER_URL", "http://plantuml.test")
@@ -0,0 +1,34 @@
+from api.iba.chunking import PART_KEY, TRUNCATED_KEY, document_tokens, split_document
+
+MODEL = "gpt-4o"
+
+
+def _paragraph_doc(paragraphs: int) -> dict:
+    return {
+        "feature_id": "F-1",
+        "name": "Order checkout",
+        "paragraphs": [
+            f'Paragraph {i}: the "checkout" service validates the cart, reserves stock and '
+            f"charges the customer before confirming order #{i}."
+            for i in range(paragraphs)
+        ],
+    }
+
+
+def test_split_parts_fit_budget_without_truncation():
+    doc = _paragraph_doc(600)
+    parts = split_document(doc, 3000, MODEL)
+
+    assert len(parts) > 1
+    assert all(TRUNCATED_KEY not in part for part in parts)
+    assert all(document_tokens(part, MODEL) <= 3000 for part in parts)
+    assert [p for part in parts for p in part["paragraphs"]] == doc["paragraphs"]
+    assert parts[-1][PART_KEY] == f"{len(parts)}/{len(parts)}"
+
+
+def test_truncated_document_fits_budget():
+    doc = {"feature_id": "F-2", "description": 'A "quoted" \\ escaped sentence. ' * 2000}
+    [part] = split_document(doc, 500, MODEL)
+
+    assert part[TRUNCATED_KEY] is True
+    assert document_tokens(part, MODEL) <= 500